@@ -32,7 +32,7 @@ class GamesController < ApplicationController
       @game_state = mock_state
     else
       # Otherwise, try to talk to Python
-      @game_state = GameEngineService.game_state(game_id: params[:id])
+      @game_state = GameEngineService.game_state(game_id: params[:id], log: 3)
     end
     rescue GameEngineError => e
       flash[:alert] = "Game not found or finished."
@@ -55,7 +55,8 @@ class GamesController < ApplicationController
         game_id:     params[:id],
         player_id:   current_user.id,
         question_id: nil,
-        answer:      params[:answer]
+        answer:      params[:answer],
+        log:         3
       )
 
       render turbo_stream: turbo_stream.update(
@@ -72,7 +73,8 @@ end
       new_state = GameEngineService.cast_card(
         game_id:   params[:id],
         player_id: current_user.id,
-hand_index: params[:hand_index].to_i
+hand_index: params[:hand_index].to_i,
+        log:       3
       )
 
       respond_to do |format|
@@ -94,7 +96,7 @@ hand_index: params[:hand_index].to_i
 
     def end_turn
     # 1. Call Python
-    new_state = GameEngineService.end_turn(game_id: params[:id])
+    new_state = GameEngineService.end_turn(game_id: params[:id], log: 3)
 
     # 2. Refresh the board
     render turbo_stream: turbo_stream.update(
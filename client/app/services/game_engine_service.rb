@@ -19,9 +19,12 @@ class GameEngineService
     })
   end
 
+  # Every call that returns a game state takes log: N to get the last N
+  # log lines back inline as state['log'] (no separate /game/log call).
+
   # ── Submit a flashcard answer ──
-  def self.answer_question(game_id:, player_id:, question_id:, answer:)
-    post('/game/answer', {
+  def self.answer_question(game_id:, player_id:, question_id:, answer:, log: nil)
+    post(with_log_param('/game/answer', log), {
       game_id:     game_id,
       player_id:   player_id,
       question_id: question_id,
@@ -30,8 +33,8 @@ class GameEngineService
   end
 
   # ── Cast a card ──
-  def self.cast_card(game_id:, player_id:, hand_index:)
-  post('/game/play', {
+  def self.cast_card(game_id:, player_id:, hand_index:, log: nil)
+  post(with_log_param('/game/play', log), {
     game_id:    game_id,
     player_id:  player_id,
     hand_index: hand_index
@@ -39,17 +42,44 @@ class GameEngineService
 end
 
   # ── Get current game state ──
-  def self.game_state(game_id:)
-    get("/game/state/#{game_id}")
+  def self.game_state(game_id:, log: nil)
+    get(with_log_param("/game/state/#{game_id}", log))
   end
 
   # ── End the current turn ──
-  def self.end_turn(game_id:)
-    post('/game/endturn', {
+  def self.end_turn(game_id:, log: nil)
+    post(with_log_param('/game/endturn', log), {
       game_id: game_id
     })
   end
 
+  # ── Get game log lines newer than `after` ──
+  # Returns { "log_seq" => 12, "first_seq" => 1, "lines" => [{ "seq" => 11, "text" => "..." }, ...] }
+  def self.game_log(game_id:, after: 0)
+    get("/game/log/#{game_id}?after=#{after.to_i}")
+  end
+
+  # ── One page of flashcard decks ──
+  # Returns { "flash_decks" => [...], "next_cursor" => "..." } (next_cursor is nil on the last page)
+  def self.list_decks(limit: 50, cursor: nil)
+    get("/decks?#{URI.encode_www_form({ limit: limit, cursor: cursor }.compact)}")
+  end
+
+  # ── One page of a deck's cards ──
+  # Returns { "count" => 120, "cards" => [{ "pos" => 0, "front" => "...", "back" => "..." }, ...], "next_cursor" => "..." }
+  def self.deck_cards(deck_id:, limit: 50, cursor: nil)
+    get("/decks/#{URI.encode_www_form_component(deck_id)}/cards?#{URI.encode_www_form({ limit: limit, cursor: cursor }.compact)}")
+  end
+
+  # ── Submit a whole turn at once ──
+  # actions: [{ type: "answer", answer: "..." }, { type: "play", hand_index: 0 }, { type: "endturn" }]
+  def self.submit_turn(game_id:, actions:, log: nil)
+    post(with_log_param('/game/turn', log), {
+      game_id: game_id,
+      actions: actions
+    })
+  end
+
   # ── End / forfeit a game ──
   def self.end_game(game_id:, player_id:, reason:)
     post('/game/end', {
@@ -63,11 +93,15 @@ end
   #  Private helpers — HTTP plumbing
   # ─────────────────────────────────
 
+  private_class_method def self.with_log_param(path, log)
+    log ? "#{path}?log=#{log.to_i}" : path
+  end
+
   private_class_method def self.post(path, body)
     uri  = URI("#{ENGINE_URL}#{path}")
     http = Net::HTTP.new(uri.host, uri.port)
 
-    request = Net::HTTP::Post.new(uri.path, 'Content-Type' => 'application/json')
+    request = Net::HTTP::Post.new(uri.request_uri, 'Content-Type' => 'application/json')
     request.body = body.to_json
 
     response = http.request(request)
@@ -2,17 +2,48 @@
 import random
 from .models import Player, Boss
 from .deck_factory import build_starting_deck
+from .game_log import GameLog
 
 ELEMENTS_3 = ["fire", "water", "ice"]
 ELEMENTS_4 = ["fire", "water", "ice", "chaos"]  # boss resistance can include chaos too
 
+# Log messages by code for GameLog. _log() only stores (code, args);
+# the text is built when log_lines is read.
+LOG_MESSAGES = {
+    "start": "Game start: drew 5 cards.",
+    "reshuffle": "Reshuffled discard into draw pile.",
+    "turn": "Turn {0}: Boss resists {1} (50% damage).",
+    "drew_1": "Drew 1 card.",
+    "correct": "Correct! +3 mana.",
+    "wrong": "Wrong. +0 mana.",
+    "hit": "{0} hits boss for {1}.",
+    "drew_2": "Drew 2 cards.",
+    "shield": "Shield prepared: block next {0} attack.",
+    "rune_heal": "Chaos Rune: healed player for {0}.",
+    "rune_mana": "Chaos Rune: gained {0} mana.",
+    "rune_damage": "Chaos Rune: dealt {0} chaos damage.",
+    "rune_draw": "Chaos Rune: drew 1 card.",
+    "rune_big_hit": "Chaos Rune: big hit for {0} damage!",
+    "boss_blocked": "Boss casts {0}! Blocked by ward.",
+    "boss_hit": "Boss casts {0}! Player takes {1}.",
+    "boss_defeated": "Boss defeated!",
+    "player_defeated": "Player defeated!",
+}
+LOG_CAPACITY = 8
+
 class GameEngine:
     """
     Headless game rules. No pygame imports.
     UI calls this class.
+    All randomness comes from self.rng (seeded), so a game can be replayed.
     """
 
-    def __init__(self):
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
         self.player = Player()
         self.boss = Boss()
 
@@ -20,24 +51,33 @@ class GameEngine:
         self.game_over = False
         self.winner = None  # "player" or "boss"
 
-        self.log_lines = []
+        # ring buffer; old entries fall off the front
+        self.log = GameLog(LOG_MESSAGES, LOG_CAPACITY)
 
         # Setup deck
         deck = build_starting_deck()
-        random.shuffle(deck)
+        self.rng.shuffle(deck)
         self.player.draw_pile = deck
 
         # Boss starts with a random resistance
-        self.boss.resistant_to = random.choice(ELEMENTS_4)
+        self.boss.resistant_to = self.rng.choice(ELEMENTS_4)
 
         # First turn draw to 5
         self._draw_cards(5)
-        self._log("Game start: drew 5 cards.")
+        self._log("start")
+
+    def _log(self, code, *args):
+        self.log.add(code, *args)
 
-    def _log(self, text):
-        self.log_lines.append(text)
-        if len(self.log_lines) > 8:
-            self.log_lines.pop(0)
+    @property
+    def log_lines(self):
+        return self.log.lines()
+
+    def log_after(self, seq):
+        """
+        [(seq, text), ...] for log entries newer than seq.
+        """
+        return self.log.after(seq)
 
     def _draw_one(self):
         if len(self.player.draw_pile) == 0:
@@ -46,8 +86,8 @@ class GameEngine:
                 return None
             self.player.draw_pile = self.player.discard_pile
             self.player.discard_pile = []
-            random.shuffle(self.player.draw_pile)
-            self._log("Reshuffled discard into draw pile.")
+            self.rng.shuffle(self.player.draw_pile)
+            self._log("reshuffle")
 
         return self.player.draw_pile.pop()
 
@@ -67,20 +107,20 @@ class GameEngine:
             return
 
         # Boss resistance changes each turn
-        self.boss.resistant_to = random.choice(ELEMENTS_4)
-        self._log(f"Turn {self.turn_number}: Boss resists {self.boss.resistant_to} (50% damage).")
+        self.boss.resistant_to = self.rng.choice(ELEMENTS_4)
+        self._log("turn", self.turn_number, self.boss.resistant_to)
 
         if self.turn_number > 1:
             # draw 1 each turn after first
             self._draw_cards(1)
-            self._log("Drew 1 card.")
+            self._log("drew_1")
 
     def grant_mana_for_correct_answer(self):
         """
         Each correct question gives +3 mana.
         """
         self.player.mana += 3
-        self._log("Correct! +3 mana.")
+        self._log("correct")
 
     def play_card_from_hand(self, hand_index):
         """
@@ -118,16 +158,16 @@ class GameEngine:
                 dmg = int(base * 0.5)
 
             self.boss.hp -= dmg
-            self._log(f"{card.name} hits boss for {dmg}.")
+            self._log("hit", card.name, dmg)
 
         elif card.card_type == "draw":
             self._draw_cards(2)
-            self._log("Drew 2 cards.")
+            self._log("drew_2")
 
         elif card.card_type == "block":
             if card.element in self.player.shields:
                 self.player.shields[card.element] = True
-                self._log(f"Shield prepared: block next {card.element} attack.")
+                self._log("shield", card.element)
 
         elif card.card_type == "random":
             self._random_effect()
@@ -135,17 +175,17 @@ class GameEngine:
     def _random_effect(self):
         # Keep effects simple and readable
         effects = ["heal", "mana", "chaos_damage", "draw", "big_attack"]
-        pick = random.choice(effects)
+        pick = self.rng.choice(effects)
 
         if pick == "heal":
             heal = 10
             self.player.hp = min(self.player.max_hp, self.player.hp + heal)
-            self._log(f"Chaos Rune: healed player for {heal}.")
+            self._log("rune_heal", heal)
 
         elif pick == "mana":
             gain = 6
             self.player.mana += gain
-            self._log(f"Chaos Rune: gained {gain} mana.")
+            self._log("rune_mana", gain)
 
         elif pick == "chaos_damage":
             base = 16
@@ -153,11 +193,11 @@ class GameEngine:
             if "chaos" == self.boss.resistant_to:
                 dmg = int(base * 0.5)
             self.boss.hp -= dmg
-            self._log(f"Chaos Rune: dealt {dmg} chaos damage.")
+            self._log("rune_damage", dmg)
 
         elif pick == "draw":
             self._draw_cards(1)
-            self._log("Chaos Rune: drew 1 card.")
+            self._log("rune_draw")
 
         else:
             base = 22
@@ -166,7 +206,7 @@ class GameEngine:
             if "chaos" == self.boss.resistant_to:
                 dmg = int(base * 0.5)
             self.boss.hp -= dmg
-            self._log(f"Chaos Rune: big hit for {dmg} damage!")
+            self._log("rune_big_hit", dmg)
 
     def end_player_turn_and_boss_acts(self):
         """
@@ -177,16 +217,16 @@ class GameEngine:
         if self.game_over:
             return
 
-        boss_element = random.choice(ELEMENTS_3)
+        boss_element = self.rng.choice(ELEMENTS_3)
         boss_dmg = 10
 
         if self.player.shields.get(boss_element, False):
             # Block consumes shield
             self.player.shields[boss_element] = False
-            self._log(f"Boss casts {boss_element}! Blocked by ward.")
+            self._log("boss_blocked", boss_element)
         else:
             self.player.hp -= boss_dmg
-            self._log(f"Boss casts {boss_element}! Player takes {boss_dmg}.")
+            self._log("boss_hit", boss_element, boss_dmg)
 
         self._check_game_over()
 
@@ -197,10 +237,10 @@ class GameEngine:
             self.game_over = True
             self.winner = "player"
             self.boss.hp = 0
-            self._log("Boss defeated!")
+            self._log("boss_defeated")
 
         if self.player.hp <= 0 and not self.game_over:
             self.game_over = True
             self.winner = "boss"
             self.player.hp = 0
-            self._log("Player defeated!")
+            self._log("player_defeated")
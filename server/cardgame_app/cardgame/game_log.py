@@ -0,0 +1,78 @@
+# cardgame/game_log.py
+# Fixed-size game log (ring buffer) of structured events, shared by this
+# engine and the hub's (hub_app/hub/game_engine.py).
+#
+# - Each event is (seq, code, args); seq counts up from 1 and never resets.
+# - Text is only built when someone reads the log (format()), using the
+#   messages table the engine passes in: code -> "template {0}" or a function.
+# - Only the last `capacity` events are kept; older ones fall off for free.
+
+import json
+from collections import deque
+
+
+class GameLog:
+    def __init__(self, messages, capacity=200):
+        self.messages = messages
+        self.capacity = capacity
+        self._events = deque(maxlen=capacity)   # (seq, code, args)
+        self.last_seq = 0
+
+    def add(self, code, *args):
+        self.last_seq += 1
+        self._events.append((self.last_seq, code, args))
+
+    def format(self, code, args):
+        msg = self.messages.get(code)
+        if msg is None:
+            # free text (e.g. logged by a UI)
+            return str(code)
+        if callable(msg):
+            return msg(*args)
+        return msg.format(*args)
+
+    def first_seq(self):
+        # Oldest seq still in the buffer (last_seq + 1 when empty)
+        if not self._events:
+            return self.last_seq + 1
+        return self._events[0][0]
+
+    def after(self, seq, limit=None):
+        """
+        Returns [(seq, text), ...] for events newer than `seq`, oldest first.
+        Events that already fell out of the buffer are skipped.
+        """
+        skip = max(0, seq - self.first_seq() + 1)
+        out = []
+        for i in range(skip, len(self._events)):
+            if limit is not None and len(out) >= limit:
+                break
+            ev_seq, code, args = self._events[i]
+            out.append((ev_seq, self.format(code, args)))
+        return out
+
+    def lines(self, count=None):
+        # Last `count` lines as text (all of them if count is None)
+        start = 0 if count is None else max(0, len(self._events) - count)
+        return [self.format(code, args) for _, code, args in list(self._events)[start:]]
+
+    def __len__(self):
+        return len(self._events)
+
+    # --------- Compact form (for GameEngine.to_bytes) ---------
+
+    def to_bytes(self):
+        data = [self.last_seq, [[code, list(args)] for _, code, args in self._events]]
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data, messages, capacity=200):
+        log = cls(messages, capacity)
+        if not data:
+            return log
+        last_seq, events = json.loads(data)
+        first = last_seq - len(events) + 1
+        for i, (code, args) in enumerate(events):
+            log._events.append((first + i, code, tuple(args)))
+        log.last_seq = last_seq
+        return log
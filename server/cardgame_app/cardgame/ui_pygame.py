@@ -97,7 +97,7 @@ class ManaBossCardGameUI:
                     self.engine.grant_mana_for_correct_answer()
                 else:
                     self.engine.player.mana += 0  # explicit (no mana)
-                    self.engine._log("Wrong. +0 mana.")
+                    self.engine._log("wrong")
 
                 if self.questions.is_done():
                     self.phase = "play"
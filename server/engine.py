@@ -1,19 +1,75 @@
 # engine.py
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import os
+import pickle
 import uuid
 import random
+import zlib
+
+# Optional speedups: orjson for JSON, msgpack for clients that ask for it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 from hub_app.hub.game_engine import GameEngine
-from hub_app.hub.deck_store import DeckStore
+from hub_app.hub.deck_store import open_deck_store
+from hub_app.hub.card_import import CardImportParser, FORMATS, format_from_content_type
+from hub_app.hub.card_export import EXPORT_FORMATS, MEDIA_TYPES, content_etag, deck_pages, export_chunks, gzip_chunks
+from hub_app.hub.sessions import SessionTable, SqliteSessionStore, SessionTableFull
+from hub_app.hub.action_log import ActionLog, ActionLogError
+from hub_app.hub.streams import StreamHub
+from hub_app.hub.permutation import Permutation, new_seed
 
-app = FastAPI()
+log = logging.getLogger(__name__)
 
-# Deck storage (same thing your pygame app uses)
-STORE = DeckStore("decks.json")
 
-# game_id -> session dict (engine + question state)
-GAMES = {}
+@asynccontextmanager
+async def lifespan(app):
+    # Rebuild games that were live when the server last stopped
+    replay_action_log()
+
+    # Background housekeeping: expire + hibernate idle games
+    task = asyncio.create_task(sweep_sessions_forever())
+    yield
+    task.cancel()
+    if ACTIONS is not None:
+        ACTIONS.close()
+    STORE.close()
+
+
+def dumps_json(data):
+    # orjson when installed, stdlib json otherwise
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps_json(content)
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# Deck storage (same thing your pygame app uses).
+# DECK_STORE_BACKEND=sqlite switches to SQLite (see open_deck_store).
+STORE = open_deck_store("decks.json")
 
 
 def normalize_answer(s):
@@ -21,10 +77,13 @@ def normalize_answer(s):
 
 
 class FlashcardQuestionCycler:
-    def __init__(self, cards):
-        self.cards = cards[:] if cards else []
-        self.order = list(range(len(self.cards)))
-        random.shuffle(self.order)
+    def __init__(self, cards, rng=None):
+        # rng: pass the game's rng so questions replay with the game
+        self.rng = rng or random.Random()
+        # deck snapshots are immutable and shared: no copy
+        self.cards = cards if cards is not None else []
+        # shuffled order, computed per position (nothing stored but the seed)
+        self.order = Permutation(new_seed(self.rng), len(self.cards))
         self.pos = 0
 
     def next(self):
@@ -32,7 +91,7 @@ class FlashcardQuestionCycler:
             return None, None
 
         if self.pos >= len(self.order):
-            random.shuffle(self.order)
+            self.order = Permutation(new_seed(self.rng), len(self.cards))
             self.pos = 0
 
         idx = self.order[self.pos]
@@ -40,15 +99,202 @@ class FlashcardQuestionCycler:
         c = self.cards[idx]
         return c["front"], c["back"]
 
+    @classmethod
+    def restore(cls, cards, seed, pos, rng):
+        # Rebuild a cycler from saved (seed, pos) without reshuffling
+        cycler = cls.__new__(cls)
+        cycler.rng = rng
+        cycler.cards = cards if cards is not None else []
+        cycler.order = Permutation(seed, len(cycler.cards))
+        cycler.pos = pos
+        return cycler
+
+
+def question_cards(deck_id):
+    # -> (deck_id actually used, cards); an empty deck falls back to "sample",
+    # and callers must record the deck returned here, not the one asked for
+    cards = STORE.get_deck_cards(deck_id)
+    if len(cards) == 0:
+        return "sample", STORE.get_deck_cards("sample")
+    return deck_id, cards
+
+
+# -------------------------
+# Game sessions
+# -------------------------
+
+def pack_session(s):
+    # Offload format: the engine uses its compact GameEngine.to_bytes(),
+    # and the cycler's cards are a deck snapshot, so only its
+    # (seed, card count, pos) is written; cards are reloaded by deck_id.
+    # The cached snapshot and field_versions are kept (plain dicts, small):
+    # without them a reloaded game would answer every ?since= delta with
+    # all of its fields.
+    data = dict(s)
+    data["game"] = s["game"].to_bytes()
+    cycler = s["cycler"]
+    data["cycler"] = (cycler.order.seed, len(cycler.cards), cycler.pos)
+    return zlib.compress(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+
+def unpack_session(raw):
+    s = pickle.loads(zlib.decompress(raw))
+    s["game"] = GameEngine.from_bytes(s["game"])
+    seed, count, pos = s["cycler"]
+    cards = question_cards(s["deck_id"])[1][:count]
+    s["cycler"] = FlashcardQuestionCycler.restore(cards, seed, pos, s["game"].rng)
+    return s
+
+
+def build_session_store():
+    # Bounded: idle games expire and the table never grows past GAME_MAX_SESSIONS.
+    max_sessions = int(os.environ.get("GAME_MAX_SESSIONS", "10000"))
+    idle_ttl = float(os.environ.get("GAME_IDLE_TTL", "3600"))       # seconds
+    evict_after = float(os.environ.get("GAME_EVICT_AFTER", "300"))  # seconds
+
+    backend = os.environ.get("GAME_SESSION_BACKEND", "memory")  # "memory" or "sqlite"
+    if backend == "sqlite":
+        # Shared by every worker: uvicorn engine:app --workers N
+        return SqliteSessionStore(
+            os.environ.get("GAME_SESSION_DB", "game_sessions.db"),
+            max_sessions=max_sessions,
+            idle_ttl=idle_ttl,
+            evict_after=evict_after,
+            pack=pack_session,
+            unpack=unpack_session,
+        )
+
+    # Games idle past GAME_HIBERNATE_AFTER are moved to GAME_SPILL_DIR (blank = off).
+    return SessionTable(
+        max_sessions=max_sessions,
+        idle_ttl=idle_ttl,
+        evict_after=evict_after,
+        spill_dir=os.environ.get("GAME_SPILL_DIR", "game_spill") or None,
+        hibernate_after=float(os.environ.get("GAME_HIBERNATE_AFTER", "120")),  # seconds
+        pack=pack_session,
+        unpack=unpack_session,
+        on_drop=session_dropped,
+    )
+
+
+def session_dropped(game_id, reason):
+    # The table expired or evicted a game: end it in the action log too,
+    # or a restart would bring it back. Its /game/stream listeners are done.
+    queue_action(game_id, "end", why=reason)
+    STREAMS.close(game_id)
 
-def snapshot(game_id):
-    s = GAMES.get(game_id)
-    if not s:
-        raise HTTPException(404, "Unknown game_id")
 
+# game_id -> session dict (engine + question state)
+GAMES = build_session_store()
+
+SWEEP_INTERVAL = float(os.environ.get("GAME_SWEEP_INTERVAL", "30"))  # seconds
+
+# Set by router.py when this process is one shard of several ("2." etc).
+# The router reads it back from the game_id to find the owning shard.
+GAME_ID_PREFIX = os.environ.get("GAME_ID_PREFIX", "")
+
+
+# Action log for crash recovery (blank = off). Only needed for the memory
+# backend; the sqlite backend already keeps sessions on disk.
+ACTION_LOG_PATH = os.environ.get("GAME_ACTION_LOG", "game_actions.log")
+ACTION_LOG_MAX_BYTES = int(os.environ.get("GAME_ACTION_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+ACTIONS = None
+if ACTION_LOG_PATH and isinstance(GAMES, SessionTable):
+    ACTIONS = ActionLog(ACTION_LOG_PATH)
+
+
+def queue_action(game_id, op, **fields):
+    # Queues a record; returns its sequence number (0 if logging is off)
+    if ACTIONS is None:
+        return 0
+    return ACTIONS.append(game_id, op, **fields)
+
+
+async def wait_for_actions(seq, game_id):
+    # Returns once record `seq` is on disk (group-committed with other requests).
+    # If it can't be written, the game in memory is ahead of its log: it's
+    # dropped (plus an "end" record, so a restart doesn't revive it half-way)
+    # before the 503, so a retry gets a 404 instead of applying the move twice.
+    if ACTIONS is not None and seq:
+        try:
+            await ACTIONS.wait_async(seq)
+        except ActionLogError:
+            async with game_lock(game_id):
+                await run_session_op(GAMES.pop, game_id, game_id=game_id)
+                queue_action(game_id, "end")
+            STREAMS.close(game_id)
+            raise HTTPException(503, "Could not save the game. Try again later.")
+
+
+# Per-game locking: a fixed set of asyncio locks picked by game_id hash
+# ("striped"), so two requests for the same game never interleave.
+GAME_LOCK_STRIPES = 1024
+GAME_LOCKS = [asyncio.Lock() for _ in range(GAME_LOCK_STRIPES)]
+
+
+def game_lock(game_id):
+    return GAME_LOCKS[hash(game_id) % GAME_LOCK_STRIPES]
+
+
+async def run_session_op(fn, *args, game_id=None):
+    # Memory sessions run inline on the event loop (no threadpool hop),
+    # except that if game_id is hibernated, it's loaded back from the spill
+    # directory in a worker thread first (file read + unpickle + deck lookup).
+    # SQLite sessions do blocking disk I/O, so they go to a worker thread.
+    if isinstance(GAMES, SessionTable):
+        if game_id is not None and GAMES.hibernated(game_id):
+            await asyncio.to_thread(GAMES.load, game_id)
+        return fn(*args)
+    return await asyncio.to_thread(fn, *args)
+
+
+def replay_action_log():
+    if ACTIONS is None:
+        return
+
+    for game_id, records in ACTIONS.live_games(GAMES.idle_ttl).items():
+        if GAMES.has(game_id):
+            continue  # already back from the spill directory (left hibernated)
+
+        start = records[0]
+        s = new_session(start["seed"], start["deck"], start["user"], start["n"])
+        for rec in records[1:]:
+            try:
+                apply_action(s, rec)
+            except HTTPException:
+                pass
+        try:
+            GAMES.put(game_id, s)
+        except SessionTableFull:
+            # No room (every game is too recent to evict): skip this one,
+            # and end it so the next restart doesn't try again
+            log.warning("session table full, game %s not restored", game_id)
+            queue_action(game_id, "end", why="full")
+
+    # Drop records of ended/expired games
+    ACTIONS.compact(GAMES.idle_ttl)
+
+
+def sweep_sessions():
+    GAMES.sweep()
+    if ACTIONS is not None and ACTIONS.size() > ACTION_LOG_MAX_BYTES:
+        ACTIONS.compact(GAMES.idle_ttl)
+
+
+async def sweep_sessions_forever():
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        try:
+            await asyncio.to_thread(sweep_sessions)
+        except Exception:
+            pass
+
+
+def build_snapshot(game_id, s):
     g = s["game"]
     return {
         "game_id": game_id,
+        "version": s["version"],
         "phase": s["phase"],  # "questions" or "play" or "game_over"
         "turn": g.turn_number,
         "player_hp": g.player.hp,
@@ -57,32 +303,168 @@ def snapshot(game_id):
         "boss_hp": g.boss.hp,
         "boss_max_hp": g.boss.max_hp,
         "boss_resists": g.boss.resistant_to,
-        "hand": [c.to_short_text() for c in g.player.hand],
+        "hand": g.hand_labels(),
         "questions_left": s["questions_left"],
         "current_question": s["current_q"],
         "game_over": g.game_over,
         "winner": g.winner,
-        "log": list(g.log_lines)[-6:],
+        "log_seq": g.log.last_seq,  # lines: ?log=N, or GET /game/log/{id}?after=
     }
 
 
+def current_snapshot(game_id, s):
+    """
+    Snapshot for s["version"], built at most once per version.
+    Also records, per field, the version that last changed it
+    (s["field_versions"]) so delta responses are cheap.
+    """
+    if s.get("snap_version") == s["version"]:
+        return s["snap"]
+
+    snap = build_snapshot(game_id, s)
+    prev = s.get("snap")
+    field_versions = s.setdefault("field_versions", {})
+    for key, value in snap.items():
+        if prev is None or prev.get(key) != value:
+            field_versions[key] = s["version"]
+
+    s["snap"] = snap
+    s["snap_version"] = s["version"]
+    return snap
+
+
+def snapshot(game_id, s):
+    # Copy, so handlers can add their own keys (answer_correct, ...)
+    return dict(current_snapshot(game_id, s))
+
+
+def snapshot_delta(game_id, s, since_version):
+    """
+    Only the fields that changed after since_version (plus game_id/version).
+    """
+    snap = current_snapshot(game_id, s)
+    field_versions = s["field_versions"]
+    out = {"game_id": game_id, "version": s["version"], "delta": True}
+    for key, value in snap.items():
+        if field_versions.get(key, 0) > since_version:
+            out[key] = value
+    return out
+
+
+def state_etag(s):
+    return f'"v{s["version"]}"'
+
+
+# -------------------------
+# Response encoding
+# -------------------------
+
+def fast_response(request, data, headers=None):
+    """
+    Encodes a plain dict/list straight into a Response (no jsonable_encoder):
+    msgpack if the client sent "Accept: application/msgpack" (and msgpack is
+    installed), JSON otherwise.
+    """
+    if msgpack is not None:
+        headers = dict(headers or {})
+        headers["Vary"] = "Accept"
+        if wants_msgpack(request):
+            return Response(msgpack.packb(data), headers=headers, media_type="application/msgpack")
+    return FastJSONResponse(data, headers=headers)
+
+
+def wants_msgpack(request):
+    return msgpack is not None and "application/msgpack" in request.headers.get("accept", "")
+
+
+# Encoded deck menus, rebuilt only when the deck store changes:
+# (name, media type) -> (store version, body)
+MENU_CACHE = {}
+
+
+def store_cached_response(request, name, build):
+    """
+    Like fast_response(request, build()), but build() and the encoding only
+    run once per deck store version; after that it's a dict lookup.
+    """
+    version = STORE.get_store_version()
+    media_type = "application/msgpack" if wants_msgpack(request) else "application/json"
+    hit = MENU_CACHE.get((name, media_type))
+    if hit is None or hit[0] != version:
+        data = build()
+        body = msgpack.packb(data) if media_type == "application/msgpack" else dumps_json(data)
+        hit = (version, body)
+        MENU_CACHE[(name, media_type)] = hit
+    headers = {"Vary": "Accept"} if msgpack is not None else None
+    return Response(hit[1], headers=headers, media_type=media_type)
+
+
+ALWAYS_SENT = ("game_id", "version", "delta")
+
+
+def select_fields(data, fields):
+    """
+    ?fields=player_hp,boss_hp,phase -> only those keys
+    (plus game_id, version and the delta marker).
+    """
+    if not fields:
+        return data
+    wanted = set(f.strip() for f in fields.split(","))
+    wanted.update(ALWAYS_SENT)
+    return {k: v for k, v in data.items() if k in wanted}
+
+
+def game_response(request, data, headers=None):
+    return fast_response(request, select_fields(data, request.query_params.get("fields")), headers)
+
+
+MAX_INLINE_LOG = 20
+
+
+def inline_log_count(request):
+    # "?log=3" on /game/start, /game/state and the action endpoints: the
+    # response also carries the last 3 log lines as "log" (text only), so a
+    # UI doesn't need a second GET /game/log per render
+    raw = request.query_params.get("log", "")
+    if not raw.isdigit():
+        return 0
+    return min(int(raw), MAX_INLINE_LOG)
+
+
+def add_log_tail(out, s, count):
+    # out must be the caller's own dict (not the cached snapshot)
+    if count:
+        out["log"] = s["game"].log.lines(count)
+    return out
+
+
+# Live /game/stream listeners (per process)
+STREAMS = StreamHub(queue_size=int(os.environ.get("GAME_STREAM_QUEUE", "16")))
+
+# With the sqlite backend other workers change games too, and their updates
+# never reach this process's STREAMS: streams re-read the session this often.
+STREAM_POLL = float(os.environ.get("GAME_STREAM_POLL", "2"))       # seconds
+STREAM_KEEP_ALIVE = 15.0                                           # seconds
+
+
+def publish_update(game_id, s, since_version):
+    # Push what changed to /game/stream listeners (no-op if nobody listens)
+    if s["version"] != since_version:
+        STREAMS.publish(game_id, snapshot_delta(game_id, s, since_version))
+
+
 # -------------------------
 # Hub / Menu endpoints
 # -------------------------
 
 @app.get("/hub/menu")
-def hub_menu():
+def hub_menu(request: Request):
     # This is "menu data" (not a GUI)
-    default_id = STORE.get_default_flash_deck_id()
-    decks = []
-    for deck_id, name, count in STORE.list_flash_decks():
-        decks.append({
-            "id": deck_id,
-            "name": name,
-            "count": count,
-            "is_default": (deck_id == default_id),
-        })
+    return store_cached_response(request, "hub_menu", build_hub_menu)
 
+
+def build_hub_menu():
+    menu = STORE.menu_decks()
     return {
         "title": "Hub App: Flashcards + Card Game",
         "options": [
@@ -92,8 +474,8 @@ def hub_menu():
             "multiplayer_not_implemented",
             "exit"
         ],
-        "default_flash_deck_id": default_id,
-        "flash_decks": decks,
+        "default_flash_deck_id": menu["default_flash_deck_id"],
+        "flash_decks": menu["flash_decks"],
         "card_game_deck": {"name": "Mana Boss Deck", "count": 40},
     }
 
@@ -102,27 +484,121 @@ def hub_menu():
 # Deck management endpoints
 # -------------------------
 
+def deck_write_error(deck_id):
+    # A store change returned False: no such deck, or a read-only (pack) deck
+    if STORE.get_deck(deck_id) is None:
+        return HTTPException(404, "Deck not found.")
+    return HTTPException(403, "Deck is read-only.")
+
+
 class CreateDeckReq(BaseModel):
     name: str
 
 
+class RenameDeckReq(BaseModel):
+    name: str
+
+
 class AddCardReq(BaseModel):
     front: str
     back: str
 
 
+# -------------------------
+# Paging (?limit=&cursor=)
+# -------------------------
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(kind, value):
+    # Opaque to clients: urlsafe base64 of a small JSON [kind, value]
+    raw = json.dumps([kind, value], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, kind):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        got_kind, value = json.loads(raw)
+    except (ValueError, TypeError, binascii.Error, json.JSONDecodeError):
+        raise HTTPException(400, "Bad cursor.")
+    if got_kind != kind:
+        raise HTTPException(400, "Bad cursor.")
+    return value
+
+
+def page_size(limit):
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
 @app.get("/decks")
-def list_decks():
+def list_decks(request: Request, limit: int = None, cursor: str = None):
+    """
+    Every deck (cached until a deck changes), or with ?limit= / ?cursor=
+    one page of them plus "next_cursor" (null on the last page).
+    """
+    if limit is None and cursor is None:
+        return store_cached_response(request, "decks", STORE.menu_decks)
+
+    size = page_size(limit)
+    after = None
+    if cursor:
+        after = decode_cursor(cursor, "deck")
+        if not (isinstance(after, list) and len(after) == 2 and all(isinstance(v, str) for v in after)):
+            raise HTTPException(400, "Bad cursor.")
+        after = tuple(after)
+
+    # one extra row tells whether there is a next page
+    rows = STORE.list_flash_decks_page(after, size + 1)
+    page = rows[:size]
+    next_cursor = None
+    if len(rows) > size:
+        next_cursor = encode_cursor("deck", [page[-1][0], page[-1][1]])
+
     default_id = STORE.get_default_flash_deck_id()
-    out = []
-    for deck_id, name, count in STORE.list_flash_decks():
-        out.append({
-            "id": deck_id,
-            "name": name,
-            "count": count,
-            "is_default": (deck_id == default_id),
-        })
-    return {"default_flash_deck_id": default_id, "flash_decks": out}
+    return fast_response(request, {
+        "default_flash_deck_id": default_id,
+        "flash_decks": [
+            {"id": deck_id, "name": name, "count": count, "is_default": deck_id == default_id}
+            for deck_id, name, count in page
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+@app.get("/decks/{deck_id}/cards")
+def list_deck_cards(deck_id: str, request: Request, limit: int = None, cursor: str = None):
+    """
+    One page of a deck's cards, oldest first, plus "next_cursor".
+    Cards are only appended, so a cursor keeps pointing at the same place
+    while cards are being added.
+    """
+    size = page_size(limit)
+    start = 0
+    if cursor:
+        start = decode_cursor(cursor, "card")
+        if not isinstance(start, int) or start < 0:
+            raise HTTPException(400, "Bad cursor.")
+
+    found = STORE.get_cards_page(deck_id, start, size)
+    if found is None:
+        raise HTTPException(404, "Deck not found.")
+    cards, total = found
+
+    end = start + len(cards)
+    return fast_response(request, {
+        "deck_id": deck_id,
+        "count": total,
+        "cards": [
+            {"pos": start + i, "front": c.front, "back": c.back}
+            for i, c in enumerate(cards)
+        ],
+        "next_cursor": encode_cursor("card", end) if end < total else None,
+    })
 
 
 @app.post("/decks")
@@ -146,6 +622,18 @@ def set_default_deck(deck_id: str):
     return {"ok": True, "default_flash_deck_id": deck_id}
 
 
+@app.post("/decks/{deck_id}/name")
+def rename_deck(deck_id: str, req: RenameDeckReq):
+    name = (req.name or "").strip()
+    if not name:
+        raise HTTPException(400, "Deck name cannot be empty.")
+
+    ok = STORE.rename_deck(deck_id, name)
+    if not ok:
+        raise deck_write_error(deck_id)
+    return {"ok": True, "deck_id": deck_id, "name": name}
+
+
 @app.post("/decks/{deck_id}/cards")
 def add_card(deck_id: str, req: AddCardReq):
     front = (req.front or "").strip()
@@ -155,38 +643,118 @@ def add_card(deck_id: str, req: AddCardReq):
 
     ok = STORE.add_card(deck_id, front, back)
     if not ok:
-        raise HTTPException(404, "Deck not found.")
+        raise deck_write_error(deck_id)
     return {"ok": True}
 
 
-# -------------------------
-# Game endpoints (integrated)
-# -------------------------
+MAX_IMPORT_CARDS = int(os.environ.get("DECK_MAX_IMPORT_CARDS", "100000"))
 
-class StartReq(BaseModel):
-    deck_id: str = ""    # optional; if blank, use default
-    user_id: str = "anon"
 
+@app.post("/decks/{deck_id}/cards:bulk")
+async def add_cards_bulk(deck_id: str, request: Request, format: str = None):
+    """
+    Many cards in one request body, one card per line:
+      NDJSON  (Content-Type: application/x-ndjson)    {"front": "...", "back": "..."}
+      CSV     (Content-Type: text/csv)                 front,back
+      TSV     (Content-Type: text/tab-separated-values) front<TAB>back
+    (or ?format=ndjson|csv|tsv). The body is parsed as it arrives. Bad rows
+    are skipped and reported by line; the good ones are saved in one write.
+    """
+    fmt = format or format_from_content_type(request.headers.get("content-type"))
+    if fmt not in FORMATS:
+        raise HTTPException(415, "Send NDJSON, CSV or TSV (Content-Type or ?format=).")
+    if STORE.get_deck(deck_id) is None:
+        raise HTTPException(404, "Deck not found.")
 
-@app.post("/game/start")
-def game_start(req: StartReq):
-    # pick deck for questions
-    deck_id = (req.deck_id or "").strip()
-    if not deck_id:
-        deck_id = STORE.get_default_flash_deck_id()
+    # parsing is CPU work, so it runs off the event loop a chunk at a time
+    parser = CardImportParser(fmt, max_cards=MAX_IMPORT_CARDS)
+    async for chunk in request.stream():
+        await asyncio.to_thread(parser.feed, chunk)
+    await asyncio.to_thread(parser.close)
 
-    cards = STORE.get_deck_cards(deck_id)
-    if len(cards) == 0:
-        cards = STORE.get_deck_cards("sample")
+    ok = await asyncio.to_thread(STORE.add_cards, deck_id, parser.cards)
+    if not ok:
+        raise deck_write_error(deck_id)
+    return {
+        "ok": True,
+        "format": fmt,
+        "added": len(parser.cards),
+        "skipped": parser.skipped,
+        "errors": parser.errors,
+    }
+
+
+# (deck_id, format) -> (card count, ETag); hashing a big deck is a full
+# pass over it, so it's only done once per count (decks only grow, so the
+# count pins the content)
+EXPORT_ETAGS = {}
+
+
+def export_etag(deck_id, fmt, count):
+    hit = EXPORT_ETAGS.get((deck_id, fmt))
+    if hit is not None and hit[0] == count:
+        return hit[1]
+    etag = content_etag(deck_pages(STORE, deck_id, count), fmt)
+    EXPORT_ETAGS[(deck_id, fmt)] = (count, etag)
+    return etag
+
+
+@app.get("/decks/{deck_id}/export")
+async def export_deck(deck_id: str, request: Request, format: str = "ndjson"):
+    """
+    Streams every card of the deck as NDJSON or CSV (same formats as
+    cards:bulk), gzip-compressed if the client accepts it. ETag +
+    If-None-Match: a backup that already has this version gets a 304.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(400, "format must be ndjson or csv.")
+    # Only the card count is read here; the first `count` cards are a fixed
+    # list, so the ETag and the body always match, even if cards are added
+    # while the export is streaming
+    page = await asyncio.to_thread(STORE.get_cards_page, deck_id, 0, 0)
+    if page is None:
+        raise HTTPException(404, "Deck not found.")
+    count = page[1]
+    etag = await asyncio.to_thread(export_etag, deck_id, format, count)
+
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    if use_gzip:
+        etag = etag[:-1] + '-gz"'
+    headers = {
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+        "Content-Disposition": f'attachment; filename="{deck_id}.{format}"',
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    # a plain generator: StreamingResponse pulls each chunk (one page of
+    # cards) in a worker thread, never on the event loop
+    chunks = export_chunks(deck_pages(STORE, deck_id, count), format)
+    if use_gzip:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[format], headers=headers)
+
+
+# -------------------------
+# Game rules
+# (shared by the endpoints and by action-log replay)
+# -------------------------
+
+def new_session(seed, deck_id, user_id, card_count=None):
+    deck_id, cards = question_cards(deck_id)
+    if card_count is not None:
+        # decks only grow, so this is the exact list the game started with
+        cards = cards[:card_count]
 
-    cycler = FlashcardQuestionCycler(cards)
+    game = GameEngine(seed)
+    cycler = FlashcardQuestionCycler(cards, game.rng)
     q, a = cycler.next()
 
-    game = GameEngine()
     game.start_new_turn()  # IMPORTANT: match pygame sequence (turn 1 + draw)
 
-    game_id = str(uuid.uuid4())
-    GAMES[game_id] = {
+    return {
         "game": game,
         "cycler": cycler,
         "phase": "questions",
@@ -194,39 +762,23 @@ def game_start(req: StartReq):
         "current_q": q,
         "current_a": a,
         "deck_id": deck_id,
-        "user_id": req.user_id,
+        "user_id": user_id,
+        "version": 1,   # bumped on every change (see /game/state ETag)
     }
 
-    return snapshot(game_id)
-
-
-@app.get("/game/state/{game_id}")
-def game_state(game_id: str):
-    return snapshot(game_id)
-
-
-class AnswerReq(BaseModel):
-    game_id: str
-    answer: str
-
-
-@app.post("/game/answer")
-def game_answer(req: AnswerReq):
-    s = GAMES.get(req.game_id)
-    if not s:
-        raise HTTPException(404, "Unknown game_id")
 
+def apply_answer(s, answer):
     if s["phase"] != "questions":
         raise HTTPException(400, "Not in questions phase.")
 
     g = s["game"]
 
     # compare answer
-    ok = normalize_answer(req.answer) == normalize_answer(s["current_a"])
+    ok = normalize_answer(answer) == normalize_answer(s["current_a"])
     if ok and s["current_a"] is not None:
         g.grant_mana_for_correct_answer()
     else:
-        g._log("Wrong. +0 mana.")
+        g._log("wrong")
 
     s["questions_left"] -= 1
 
@@ -240,56 +792,36 @@ def game_answer(req: AnswerReq):
     if g.game_over:
         s["phase"] = "game_over"
 
-    out = snapshot(req.game_id)
-    out["answer_correct"] = ok
-    return out
-
-
-class PlayReq(BaseModel):
-    game_id: str
-    hand_index: int
+    s["version"] += 1
+    return ok
 
 
-@app.post("/game/play")
-def game_play(req: PlayReq):
-    s = GAMES.get(req.game_id)
-    if not s:
-        raise HTTPException(404, "Unknown game_id")
-
+def apply_play(s, hand_index):
     if s["phase"] != "play":
         raise HTTPException(400, "Not in play phase.")
 
     g = s["game"]
-    success, msg = g.play_card_from_hand(req.hand_index)
+    success, msg = g.play_card_from_hand(hand_index)
 
     if g.game_over:
         s["phase"] = "game_over"
 
-    out = snapshot(req.game_id)
-    out["play_success"] = success
-    out["message"] = msg
-    return out
+    if success:
+        s["version"] += 1
+    return success, msg
 
 
-class EndTurnReq(BaseModel):
-    game_id: str
-
-
-@app.post("/game/endturn")
-def game_endturn(req: EndTurnReq):
-    s = GAMES.get(req.game_id)
-    if not s:
-        raise HTTPException(404, "Unknown game_id")
-
+def apply_endturn(s):
     if s["phase"] != "play":
         raise HTTPException(400, "Not in play phase.")
 
     g = s["game"]
     g.end_player_turn_and_boss_acts()
+    s["version"] += 1
 
     if g.game_over:
         s["phase"] = "game_over"
-        return snapshot(req.game_id)
+        return
 
     # Next turn begins: reset to questions
     g.start_new_turn()
@@ -298,4 +830,352 @@ def game_endturn(req: EndTurnReq):
     q, a = s["cycler"].next()
     s["current_q"], s["current_a"] = q, a
 
-    return snapshot(req.game_id)
+
+def apply_action(s, rec):
+    # rec is an action-log record (see hub/action_log.py)
+    op = rec["op"]
+    if op == "answer":
+        apply_answer(s, rec["a"])
+    elif op == "play":
+        apply_play(s, rec["i"])
+    elif op == "endturn":
+        apply_endturn(s)
+
+
+# -------------------------
+# Game endpoints (integrated)
+# -------------------------
+
+class StartReq(BaseModel):
+    deck_id: str = ""    # optional; if blank, use default
+    user_id: str = "anon"
+
+
+@app.post("/game/start")
+async def game_start(req: StartReq, request: Request):
+    # pick deck for questions
+    deck_id = (req.deck_id or "").strip()
+    if not deck_id:
+        deck_id = await asyncio.to_thread(STORE.get_default_flash_deck_id)
+
+    # Reads the deck (disk / database on a cold cache), so off the event loop
+    seed = random.getrandbits(64)
+    s = await asyncio.to_thread(new_session, seed, deck_id, req.user_id)
+
+    game_id = GAME_ID_PREFIX + str(uuid.uuid4())
+    snap = current_snapshot(game_id, s)   # before put(), so it's stored with the session
+    count = inline_log_count(request)
+    if count:
+        snap = add_log_tail(dict(snap), s, count)
+    try:
+        await run_session_op(GAMES.put, game_id, s)
+    except SessionTableFull:
+        raise HTTPException(503, "Too many active games. Try again later.")
+
+    seq = queue_action(
+        game_id, "start", seed=seed, deck=s["deck_id"], user=req.user_id, n=len(s["cycler"].cards)
+    )
+    await wait_for_actions(seq, game_id)
+    return game_response(request, snap)
+
+
+@app.get("/game/state/{game_id}")
+async def game_state(game_id: str, request: Request, since_version: int = None, fields: str = None):
+    # fields: "?fields=phase,player_hp,boss_hp" for light pollers
+    s = await run_session_op(GAMES.get, game_id, game_id=game_id)
+    if not s:
+        raise HTTPException(404, "Unknown game_id")
+
+    # Nothing changed since the client's copy: no body at all
+    etag = state_etag(s)
+    client_etags = request.headers.get("if-none-match", "").split(",")
+    if etag in [t.strip() for t in client_etags]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    count = inline_log_count(request)
+    if since_version is not None:
+        out = add_log_tail(snapshot_delta(game_id, s, since_version), s, count)
+    elif count:
+        out = add_log_tail(snapshot(game_id, s), s, count)
+    else:
+        out = current_snapshot(game_id, s)
+    return game_response(request, out, {"ETag": etag})
+
+
+MAX_LOG_LINES = 200
+
+
+@app.get("/game/log/{game_id}")
+async def game_log(game_id: str, request: Request, after: int = 0, limit: int = MAX_LOG_LINES):
+    """
+    Log lines with seq > after, oldest first. Poll with after=<last seq seen>
+    (or the snapshot's log_seq) to only get new lines.
+    Lines older than first_seq are no longer kept.
+    """
+    s = await run_session_op(GAMES.get, game_id, game_id=game_id)
+    if not s:
+        raise HTTPException(404, "Unknown game_id")
+
+    log = s["game"].log
+    lines = log.after(after, max(0, min(limit, MAX_LOG_LINES)))
+    return fast_response(request, {
+        "game_id": game_id,
+        "log_seq": log.last_seq,
+        "first_seq": log.first_seq(),
+        "lines": [{"seq": seq, "text": text} for seq, text in lines],
+    })
+
+
+@app.get("/game/stream/{game_id}")
+async def game_stream(game_id: str, request: Request, since_version: int = None, fields: str = None):
+    """
+    Server-Sent Events: one "state" event with the current snapshot (or the
+    delta since ?since_version= / Last-Event-ID), then one delta event after
+    every accepted answer, play or end turn. Event ids are state versions.
+    """
+    s = await run_session_op(GAMES.get, game_id, game_id=game_id)
+    if not s:
+        raise HTTPException(404, "Unknown game_id")
+
+    last_id = request.headers.get("last-event-id", "")
+    if since_version is None and last_id.isdigit():
+        since_version = int(last_id)
+
+    q = STREAMS.subscribe(game_id)
+    if since_version is not None:
+        first = snapshot_delta(game_id, s, since_version)
+    else:
+        first = current_snapshot(game_id, s)
+    shared = not isinstance(GAMES, SessionTable)
+
+    async def events():
+        sent = s["version"]   # newest version the client has
+        try:
+            yield sse_event(select_fields(first, fields))
+            idle = 0.0
+            while True:
+                wait = STREAM_POLL if shared else STREAM_KEEP_ALIVE
+                try:
+                    update = await asyncio.wait_for(q.get(), timeout=wait)
+                except asyncio.TimeoutError:
+                    update = False
+                if update is None:
+                    break  # game ended, or we were too slow and got dropped
+
+                if shared:
+                    # Any worker may have moved the game on: send whatever
+                    # changed since `sent`, read back from the store
+                    cur = await asyncio.to_thread(GAMES.peek, game_id)
+                    if cur is None:
+                        break  # ended, expired or evicted
+                    update = snapshot_delta(game_id, cur, sent) if cur["version"] > sent else False
+                elif update is False and not GAMES.has(game_id):
+                    break  # expired while nobody was moving it
+
+                if update is False or update["version"] <= sent:
+                    idle += wait
+                    if idle >= STREAM_KEEP_ALIVE:
+                        idle = 0.0
+                        yield ": keep-alive\n\n"
+                    continue
+                sent = update["version"]
+                idle = 0.0
+                update = select_fields(update, fields)
+                if fields and all(k in ALWAYS_SENT for k in update):
+                    continue  # none of the requested fields changed
+                yield sse_event(update)
+        finally:
+            STREAMS.unsubscribe(game_id, q)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def sse_event(data):
+    return f"id: {data['version']}\nevent: state\ndata: {dumps_json(data).decode('utf-8')}\n\n"
+
+
+# Each mutating endpoint below:
+#   1. takes the game's lock,
+#   2. runs a plain function that loads -> mutates -> saves the session
+#      (one transaction; matters for the sqlite backend) and queues the
+#      action-log records,
+#   3. releases the lock and waits for the records to be on disk.
+
+class AnswerReq(BaseModel):
+    game_id: str
+    answer: str
+
+
+def do_answer(req, log_count=0):
+    with GAMES.transaction(req.game_id) as s:
+        if not s:
+            raise HTTPException(404, "Unknown game_id")
+
+        before = s["version"]
+        ok = apply_answer(s, req.answer)
+        seq = queue_action(req.game_id, "answer", a=req.answer)
+        publish_update(req.game_id, s, before)
+
+        out = add_log_tail(snapshot(req.game_id, s), s, log_count)
+        out["answer_correct"] = ok
+        return out, seq
+
+
+@app.post("/game/answer")
+async def game_answer(req: AnswerReq, request: Request):
+    async with game_lock(req.game_id):
+        out, seq = await run_session_op(do_answer, req, inline_log_count(request), game_id=req.game_id)
+    await wait_for_actions(seq, req.game_id)
+    return game_response(request, out)
+
+
+class PlayReq(BaseModel):
+    game_id: str
+    hand_index: int
+
+
+def do_play(req, log_count=0):
+    with GAMES.transaction(req.game_id) as s:
+        if not s:
+            raise HTTPException(404, "Unknown game_id")
+
+        before = s["version"]
+        success, msg = apply_play(s, req.hand_index)
+        seq = 0
+        if success:
+            seq = queue_action(req.game_id, "play", i=req.hand_index)
+            publish_update(req.game_id, s, before)
+
+        out = add_log_tail(snapshot(req.game_id, s), s, log_count)
+        out["play_success"] = success
+        out["message"] = msg
+        return out, seq
+
+
+@app.post("/game/play")
+async def game_play(req: PlayReq, request: Request):
+    async with game_lock(req.game_id):
+        out, seq = await run_session_op(do_play, req, inline_log_count(request), game_id=req.game_id)
+    await wait_for_actions(seq, req.game_id)
+    return game_response(request, out)
+
+
+class EndTurnReq(BaseModel):
+    game_id: str
+
+
+def do_endturn(req, log_count=0):
+    with GAMES.transaction(req.game_id) as s:
+        if not s:
+            raise HTTPException(404, "Unknown game_id")
+
+        before = s["version"]
+        apply_endturn(s)
+        seq = queue_action(req.game_id, "endturn")
+        publish_update(req.game_id, s, before)
+
+        return add_log_tail(snapshot(req.game_id, s), s, log_count), seq
+
+
+@app.post("/game/endturn")
+async def game_endturn(req: EndTurnReq, request: Request):
+    async with game_lock(req.game_id):
+        out, seq = await run_session_op(do_endturn, req, inline_log_count(request), game_id=req.game_id)
+    await wait_for_actions(seq, req.game_id)
+    return game_response(request, out)
+
+
+class TurnAction(BaseModel):
+    type: str            # "answer" | "play" | "endturn"
+    answer: str = ""     # for "answer"
+    hand_index: int = 0  # for "play"
+
+
+class TurnReq(BaseModel):
+    game_id: str
+    actions: list[TurnAction]
+
+
+MAX_TURN_ACTIONS = 64
+
+
+def do_turn(req, log_count=0):
+    with GAMES.transaction(req.game_id) as s:
+        if not s:
+            raise HTTPException(404, "Unknown game_id")
+
+        before = s["version"]
+        results = []
+        seq = 0
+
+        for action in req.actions:
+            result = {"type": action.type, "ok": True}
+            try:
+                if action.type == "answer":
+                    result["answer_correct"] = apply_answer(s, action.answer)
+                    seq = queue_action(req.game_id, "answer", a=action.answer)
+                elif action.type == "play":
+                    success, msg = apply_play(s, action.hand_index)
+                    result["ok"] = success
+                    result["message"] = msg
+                    if success:
+                        seq = queue_action(req.game_id, "play", i=action.hand_index)
+                elif action.type == "endturn":
+                    apply_endturn(s)
+                    seq = queue_action(req.game_id, "endturn")
+                else:
+                    result["ok"] = False
+                    result["message"] = "Unknown action type."
+            except HTTPException as e:
+                result["ok"] = False
+                result["message"] = e.detail
+
+            results.append(result)
+            if not result["ok"]:
+                break
+
+        publish_update(req.game_id, s, before)
+
+        out = add_log_tail(snapshot(req.game_id, s), s, log_count)
+        out["results"] = results
+        out["applied"] = sum(1 for r in results if r["ok"])
+        return out, seq
+
+
+@app.post("/game/turn")
+async def game_turn(req: TurnReq, request: Request):
+    """
+    Applies a list of actions in order, in one request.
+    Stops at the first rejected action; the ones before it stay applied.
+    Returns one final snapshot plus a result per attempted action.
+    """
+    if len(req.actions) > MAX_TURN_ACTIONS:
+        raise HTTPException(400, f"At most {MAX_TURN_ACTIONS} actions per turn request.")
+
+    async with game_lock(req.game_id):
+        out, seq = await run_session_op(do_turn, req, inline_log_count(request), game_id=req.game_id)
+    # one durability wait for the whole batch
+    await wait_for_actions(seq, req.game_id)
+    return game_response(request, out)
+
+
+class EndReq(BaseModel):
+    game_id: str
+
+
+@app.post("/game/end")
+async def game_end(req: EndReq):
+    # Frees the session right away (forfeit / leave / finished)
+    async with game_lock(req.game_id):
+        s = await run_session_op(GAMES.pop, req.game_id, game_id=req.game_id)
+        if not s:
+            raise HTTPException(404, "Unknown game_id")
+        seq = queue_action(req.game_id, "end")
+
+    STREAMS.close(req.game_id)
+    await wait_for_actions(seq, req.game_id)
+    return {"ok": True, "game_id": req.game_id}
@@ -1,17 +1,20 @@
-import random
+try:
+    from .permutation import Permutation, new_seed
+except ImportError:
+    # run as a script next to this file (engine_server.py)
+    from permutation import Permutation, new_seed
 
 def normalize_answer(s):
     return " ".join(s.lower().strip().split())
 
 def start_quiz(cards):
-    order = list(range(len(cards)))
-    random.shuffle(order)
-    return {"order": order, "pos": 0, "score": 0}
+    # The question order is Permutation(seed, len(cards)): only the seed travels
+    return {"seed": new_seed(), "pos": 0, "score": 0}
 
 def current_card(cards, state):
-    if state["pos"] >= len(state["order"]):
+    if state["pos"] >= len(cards):
         return None
-    idx = state["order"][state["pos"]]
+    idx = Permutation(state["seed"], len(cards)).index_at(state["pos"])
     return cards[idx]
 
 def check_answer(correct, user):
@@ -29,7 +32,7 @@ def apply_answer(cards, state, user_answer):
 
     # advance to next question
     new_state["pos"] += 1
-    done = new_state["pos"] >= len(new_state["order"])
+    done = new_state["pos"] >= len(cards)
 
     return {
         "done": done,
@@ -1,4 +1,4 @@
-import random
+from .permutation import Permutation, new_seed
 
 
 def normalize_answer(s):
@@ -19,14 +19,13 @@ class FlashcardService:
         return self.repo.delete_card(card_id)
 
     def start_quiz(self, cards):
-        order = list(range(len(cards)))
-        random.shuffle(order)
-        return {"order": order, "pos": 0, "score": 0}
+        # Question order is Permutation(seed, len(cards)), computed per question
+        return {"seed": new_seed(), "pos": 0, "score": 0}
 
     def quiz_current_card(self, cards, quiz_state):
-        if quiz_state["pos"] >= len(quiz_state["order"]):
+        if quiz_state["pos"] >= len(cards):
             return None
-        idx = quiz_state["order"][quiz_state["pos"]]
+        idx = Permutation(quiz_state["seed"], len(cards)).index_at(quiz_state["pos"])
         return cards[idx]
 
     def quiz_check_answer(self, correct, user):
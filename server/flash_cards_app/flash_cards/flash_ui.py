@@ -188,7 +188,7 @@ class FlashcardsPygameApp:
                     self.quiz_state["pos"] += 1
                     self.answer_box.text = ""
                     self.quiz_feedback = None
-                    if self.quiz_state["pos"] >= len(self.quiz_state["order"]):
+                    if self.quiz_state["pos"] >= len(self.cards):
                         self.mode = "quiz_done"
                     else:
                         self.mode = "quiz"
@@ -252,7 +252,7 @@ class FlashcardsPygameApp:
                 return
 
             header = font.render(
-                f"Q {self.quiz_state['pos']+1}/{len(self.quiz_state['order'])}   Score: {self.quiz_state['score']}",
+                f"Q {self.quiz_state['pos']+1}/{len(self.cards)}   Score: {self.quiz_state['score']}",
                 True, (50, 50, 50)
             )
             screen.blit(header, (60, 120))
@@ -278,7 +278,7 @@ class FlashcardsPygameApp:
 
         elif self.mode == "quiz_done":
             done = big_font.render(
-                f"Final Score: {self.quiz_state['score']} / {len(self.quiz_state['order'])}",
+                f"Final Score: {self.quiz_state['score']} / {len(self.cards)}",
                 True, (20, 20, 20)
             )
             screen.blit(done, (60, 200))
@@ -0,0 +1,266 @@
+# hub/action_log.py
+# Append-only, on-disk log of game actions (one JSON object per line).
+#
+# A game is fully described by its start record (seed, deck, ...) plus the
+# actions that were accepted after it, so the API server can rebuild every
+# live game after a restart by replaying them.
+#
+# Writes are group-committed: append() only queues the record, and one
+# background thread writes + fsyncs everything queued so far in a single
+# batch. Callers that need durability wait() for their record
+# (or `await wait_async()` from the event loop).
+#
+# If a write fails, that batch is cut back off the file and wait() raises
+# ActionLogError for each of its records; the next batch is tried as usual,
+# so a full disk that frees up again doesn't stop logging for good. A game
+# with a lost record has a gap in its history, so the caller must drop it
+# (and log an "end" for it) rather than carry on.
+
+import asyncio
+import json
+import os
+import threading
+import time
+
+# How many failed batches wait() remembers (failures are rare and callers
+# wait for their record right after appending it)
+MAX_FAILED_BATCHES = 64
+
+
+class ActionLogError(Exception):
+    """Raised by wait() / wait_async() when a record couldn't be written."""
+    pass
+
+
+class ActionLog:
+    """
+    Records look like:
+      {"g": game_id, "op": "start", "t": time, ...start fields...}
+      {"g": game_id, "op": "answer", "t": time, "a": "text"}
+      {"g": game_id, "op": "play", "t": time, "i": 2}
+      {"g": game_id, "op": "endturn", "t": time}
+      {"g": game_id, "op": "end", "t": time}
+      {"g": game_id, "op": "end", "t": time, "why": "expired"}   (or "evicted", "full")
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self._clock = clock
+
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()   # guards self._file
+        self._pending = []     # encoded lines waiting to be written
+        self._queued = 0       # sequence number of the last queued record
+        self._taken = 0        # sequence number of the last record handed to a batch
+        self._settled = 0      # sequence number of the last record written or given up on
+        self._failed = []      # (first, last) sequence numbers of batches that weren't written
+        self._waiters = []     # (seq, asyncio future) from wait_async()
+        self._closed = False
+        self._error = None     # OSError of the last failed write, if any
+
+        self._file = open(self.path, "ab")
+        self._thread = threading.Thread(target=self._commit_loop, daemon=True)
+        self._thread.start()
+
+    # --------- Writing ---------
+
+    def append(self, game_id, op, **fields):
+        """
+        Queues one record and returns its sequence number (see wait()).
+        """
+        rec = {"g": game_id, "op": op, "t": round(self._clock(), 3)}
+        rec.update(fields)
+        line = (json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._cond:
+            self._pending.append(line)
+            self._queued += 1
+            seq = self._queued
+            self._cond.notify_all()
+        return seq
+
+    def wait(self, seq):
+        """
+        Blocks until record `seq` (and everything before it) is on disk.
+        Raises ActionLogError if it never will be.
+        """
+        with self._cond:
+            self._wait_settled(seq)
+            if self._lost(seq):
+                raise self._failure()
+
+    async def wait_async(self, seq):
+        """
+        Like wait(), but doesn't block the event loop.
+        """
+        with self._cond:
+            if self._settled >= seq:
+                if self._lost(seq):
+                    raise self._failure()
+                return
+            if self._closed:
+                return
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append((seq, fut))
+        await fut
+
+    def flush(self):
+        # Waits until everything queued so far was written (or failed)
+        with self._cond:
+            self._wait_settled(self._queued)
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            waiters = self._waiters
+            self._waiters = []
+        self._wake(waiters)
+        self._thread.join()
+        self._file.close()
+
+    def _commit_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                batch = self._pending
+                self._pending = []
+                first = self._taken + 1
+                seq = self._taken = self._queued
+
+            # One write + one fsync for the whole batch.
+            # Records queued meanwhile form the next batch.
+            with self._io_lock:
+                pos = None
+                try:
+                    pos = self._file.tell()
+                    self._file.write(b"".join(batch))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    error = None
+                except (OSError, ValueError) as e:
+                    error = e
+                    self._discard_partial(pos)
+
+            with self._cond:
+                if error is not None:
+                    self._error = error
+                    self._failed.append((first, seq))
+                    del self._failed[:-MAX_FAILED_BATCHES]
+                self._settled = seq
+                self._cond.notify_all()
+                ready = [w for w in self._waiters if w[0] <= seq]
+                self._waiters = [w for w in self._waiters if w[0] > seq]
+            if error is not None:
+                self._wake(ready, self._failure())
+            else:
+                self._wake(ready)
+
+    def _discard_partial(self, pos):
+        # A failed write may have left part of the batch in the file (and in
+        # the file object's buffer); cut it off so the next batch starts on a
+        # clean line. If even that fails, the next batch fails and retries.
+        try:
+            self._file.close()
+        except (OSError, ValueError):
+            pass
+        try:
+            if pos is not None:
+                os.truncate(self.path, pos)
+            self._file = open(self.path, "ab")
+        except OSError:
+            pass
+
+    def _wait_settled(self, seq):
+        # caller holds self._cond
+        while self._settled < seq and not self._closed:
+            self._cond.wait()
+
+    def _lost(self, seq):
+        return any(first <= seq <= last for first, last in self._failed)
+
+    def _failure(self):
+        return ActionLogError(f"could not write {self.path}: {self._error}")
+
+    def _wake(self, waiters, error=None):
+        for _, fut in waiters:
+            try:
+                fut.get_loop().call_soon_threadsafe(_resolve, fut, error)
+            except RuntimeError:
+                pass  # loop already closed
+
+    # --------- Reading / replay ---------
+
+    def live_games(self, idle_ttl=None):
+        """
+        Returns {game_id: [start_record, action, action, ...]} for games that
+        were started and never ended. If idle_ttl is given, games whose last
+        record is older than that are treated as expired.
+        """
+        self.flush()
+        with self._io_lock:
+            return self._read_live(idle_ttl)
+
+    def _read_live(self, idle_ttl):
+        games = {}
+        with open(self.path, "rb") as f:
+            for raw in f:
+                try:
+                    rec = json.loads(raw)
+                    game_id = rec["g"]
+                    op = rec["op"]
+                except:
+                    # torn last line after a crash, or junk
+                    continue
+
+                if op == "start":
+                    games[game_id] = [rec]
+                elif op == "end":
+                    games.pop(game_id, None)
+                elif game_id in games:
+                    games[game_id].append(rec)
+
+        if idle_ttl is not None:
+            cutoff = self._clock() - idle_ttl
+            games = {g: recs for g, recs in games.items() if recs[-1].get("t", 0) > cutoff}
+        return games
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def compact(self, idle_ttl=None):
+        """
+        Rewrites the log so it only holds records of live games.
+        Appends made meanwhile just wait in the queue for the new file.
+        """
+        self.flush()
+        with self._io_lock:
+            games = self._read_live(idle_ttl)
+
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                for recs in games.values():
+                    for rec in recs:
+                        line = json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n"
+                        f.write(line.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._file.close()
+            os.replace(tmp, self.path)
+            self._file = open(self.path, "ab")
+
+
+def _resolve(fut, error=None):
+    if fut.done():
+        return
+    if error is not None:
+        fut.set_exception(error)
+    else:
+        fut.set_result(None)
@@ -0,0 +1,86 @@
+# hub/card_export.py
+# Deck export (GET /decks/{deck_id}/export), written a chunk at a time.
+#
+#   cards = deck_pages(STORE, deck_id, count)  # read a page at a time
+#   for text in export_chunks(cards, "csv"):   # cards: any iterable of cards
+#       ...                                    # a few hundred rows each
+#
+# Formats match hub/card_import.py, so an export can be imported again:
+#   ndjson: {"front": "...", "back": "..."} per line
+#   csv:    a "front,back" header, then one row per card
+
+import csv
+import hashlib
+import io
+import json
+import zlib
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def deck_pages(store, deck_id, count, page_size=500):
+    """
+    Yields the first `count` cards of a deck via store.get_cards_page(), one
+    page at a time, so the deck is never loaded (or cached) whole. Cards are
+    only ever appended, so these stay the same cards for the whole pass.
+    """
+    for start in range(0, count, page_size):
+        page = store.get_cards_page(deck_id, start, min(page_size, count - start))
+        if page is None:
+            return
+        yield from page[0]
+
+
+def export_chunks(cards, fmt, chunk_size=500):
+    """
+    Yields the export as utf-8 byte chunks of up to chunk_size cards.
+    Only one chunk is in memory at a time.
+    """
+    buf = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerow(["front", "back"])
+
+    count = 0
+    for card in cards:
+        if fmt == "csv":
+            writer.writerow([card.front, card.back])
+        else:
+            buf.write(json.dumps({"front": card.front, "back": card.back}, ensure_ascii=False))
+            buf.write("\n")
+        count += 1
+        if count >= chunk_size:
+            yield _take(buf)
+            count = 0
+    if buf.tell():
+        yield _take(buf)
+
+
+def _take(buf):
+    text = buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    return text.encode("utf-8")
+
+
+def content_etag(cards, fmt):
+    # Strong ETag of the (uncompressed) export: one streaming pass, no copy
+    h = hashlib.sha256()
+    for chunk in export_chunks(cards, fmt):
+        h.update(chunk)
+    return f'"{fmt}-{h.hexdigest()[:32]}"'
+
+
+def gzip_chunks(chunks, level=6):
+    # gzip stream of the chunks, compressed as they go
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)   # 31: gzip header + trailer
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
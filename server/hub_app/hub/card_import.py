@@ -0,0 +1,212 @@
+# hub/card_import.py
+# Incremental parser for bulk card imports (POST /decks/{deck_id}/cards:bulk).
+#
+#   parser = CardImportParser("csv")
+#   for chunk in body_chunks:        # bytes, any size, split anywhere
+#       parser.feed(chunk)
+#   parser.close()
+#   parser.cards    -> [(front, back), ...] valid rows, in order
+#   parser.errors   -> [{"line": 7, "error": "..."}, ...] (first max_errors)
+#   parser.skipped  -> number of bad rows
+#
+# Formats (one card per row):
+#   ndjson: {"front": "...", "back": "..."}
+#   csv:    front,back        (quoted fields may contain commas / newlines)
+#   tsv:    front<TAB>back
+# A first csv/tsv row of exactly "front","back" is treated as a header.
+# Blank lines are ignored. At most one record (max_record characters) is
+# buffered, never the body; a longer one is reported and skipped.
+
+import codecs
+import csv
+import json
+
+FORMATS = ("ndjson", "csv", "tsv")
+
+CONTENT_TYPES = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/x-jsonlines": "ndjson",
+    "text/csv": "csv",
+    "text/tab-separated-values": "tsv",
+}
+
+
+def format_from_content_type(content_type):
+    # "text/csv; charset=utf-8" -> "csv" (None if unknown)
+    media = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPES.get(media)
+
+
+class CardImportParser:
+    def __init__(self, fmt, max_cards=None, max_errors=100, max_record=64 * 1024):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown import format: {fmt}")
+        self.fmt = fmt
+        self.max_cards = max_cards
+        self.max_errors = max_errors
+        self.max_record = max_record
+        self.cards = []
+        self.errors = []
+        self.skipped = 0
+        self.too_many = False   # stopped at max_cards
+
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._buf = ""          # text after the last complete line
+        self._line_no = 0       # physical lines seen so far
+        self._record = []       # csv: lines of a record whose quoted field is still open
+        self._record_len = 0    # characters in _record
+        self._record_line = 0   # line number the open record started on
+        self._in_quotes = False # csv: inside a quoted field at the end of _record
+        self._skip_line = False # rest of an over-long line is being thrown away
+        self._first_row = True
+
+    # --------- Input ---------
+
+    def feed(self, chunk):
+        self._buf += self._decoder.decode(chunk)
+        lines = self._buf.split("\n")
+        self._buf = lines.pop()
+        for line in lines:
+            if self._skip_line:
+                # end of the over-long line
+                self._skip_line = False
+                self._line_no += 1
+                continue
+            self._line(line)
+        if len(self._buf) > self.max_record and not self._skip_line:
+            self._skip_line = True
+            self._error(self._line_no + 1, f"line longer than {self.max_record} characters")
+        if self._skip_line:
+            self._buf = ""
+
+    def close(self):
+        self._buf += self._decoder.decode(b"", final=True)
+        if self._skip_line:
+            self._skip_line = False
+            self._line_no += 1
+        elif self._buf:
+            self._line(self._buf)
+        self._buf = ""
+        if self._record:
+            self._error(self._record_line, "unterminated quoted field")
+            self._drop_record()
+
+    # --------- Rows ---------
+
+    def _line(self, line):
+        self._line_no += 1
+        if line.endswith("\r"):
+            line = line[:-1]
+
+        if self.fmt == "ndjson":
+            if line.strip():
+                self._ndjson_row(line)
+            return
+
+        # csv/tsv: a record ends at the end of a line that isn't inside a
+        # quoted field (a quoted field may hold newlines)
+        if not self._record:
+            if not line.strip():
+                return
+            self._record_line = self._line_no
+        self._record.append(line)
+        self._record_len += len(line) + 1
+        self._in_quotes = self._scan_quotes(line, self._in_quotes)
+        if not self._in_quotes:
+            text = "\n".join(self._record)
+            self._drop_record()
+            self._delimited_row(text)
+        elif self._record_len > self.max_record:
+            self._error(self._record_line, f"quoted field longer than {self.max_record} characters")
+            self._drop_record()
+
+    def _scan_quotes(self, line, in_quotes):
+        """
+        Whether the record is inside a quoted field after this line.
+        A quote only opens a field at its very start ("5" nails" is plain
+        text), and inside a quoted field "" is an escaped quote.
+        """
+        if not in_quotes and '"' not in line:
+            return False
+        delimiter = "," if self.fmt == "csv" else "\t"
+        field_start = not in_quotes
+        i = 0
+        n = len(line)
+        while i < n:
+            ch = line[i]
+            if in_quotes:
+                if ch == '"':
+                    if i + 1 < n and line[i + 1] == '"':
+                        i += 1   # escaped quote
+                    else:
+                        in_quotes = False
+            elif ch == delimiter:
+                field_start = True
+                i += 1
+                continue
+            elif ch == '"' and field_start:
+                in_quotes = True
+            field_start = False
+            i += 1
+        return in_quotes
+
+    def _drop_record(self):
+        self._record = []
+        self._record_len = 0
+        self._in_quotes = False
+
+    def _ndjson_row(self, line):
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            self._error(self._line_no, "invalid JSON")
+            return
+        if not isinstance(obj, dict) or "front" not in obj or "back" not in obj:
+            self._error(self._line_no, 'expected {"front": ..., "back": ...}')
+            return
+        front, back = obj["front"], obj["back"]
+        if not isinstance(front, (str, int, float)) or not isinstance(back, (str, int, float)):
+            self._error(self._line_no, "front and back must be text")
+            return
+        self._card(self._line_no, str(front), str(back))
+
+    def _delimited_row(self, text):
+        delimiter = "," if self.fmt == "csv" else "\t"
+        try:
+            row = next(csv.reader([text], delimiter=delimiter, strict=True))
+        except (csv.Error, StopIteration):
+            self._error(self._record_line, f"invalid {self.fmt.upper()} row")
+            return
+
+        if self._first_row:
+            self._first_row = False
+            if [c.strip().lower() for c in row] == ["front", "back"]:
+                return
+        if len(row) != 2:
+            self._error(self._record_line, f"expected 2 columns, got {len(row)}")
+            return
+        self._card(self._record_line, row[0], row[1])
+
+    def _card(self, line_no, front, back):
+        front = front.strip()
+        back = back.strip()
+        if not front or not back:
+            self._error(line_no, "front and back must be non-empty")
+            return
+        if self.max_cards is not None and len(self.cards) >= self.max_cards:
+            if not self.too_many:
+                self.too_many = True
+                self._error(line_no, f"more than {self.max_cards} cards; the rest were skipped")
+            else:
+                self.skipped += 1
+            return
+        self._first_row = False
+        self.cards.append((front, back))
+
+    def _error(self, line_no, message):
+        self._first_row = False
+        self.skipped += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line_no, "error": message})
@@ -0,0 +1,147 @@
+# hub/deck_pack.py
+# Read-only "deck packs": decks compiled into one binary file that is
+# mmap'ed instead of parsed.
+#
+# Made for big curated decks that only change between releases: every
+# worker process maps the same file, so the OS page cache holds one copy
+# for all of them, and opening a pack only reads its small directory.
+# Cards are read straight from the mapping when someone asks for them.
+#
+# Layout (little-endian):
+#   header     "DKPK", u16 format version, u16 unused, u32 deck count, u64 directory offset
+#   strings    utf-8 text of every front and back, back to back
+#   offsets    per deck: 2*count + 1 u64 file offsets; card i is
+#              front = [o[2i], o[2i+1]), back = [o[2i+1], o[2i+2])
+#   directory  JSON: [{"id", "name", "count", "offsets"}, ...]
+#
+# Build one from a decks.json (all decks, or just the ids given):
+#   python -m hub_app.hub.deck_pack decks.json curated.pack [deck_id ...]
+# and serve it with DECK_PACKS=curated.pack (see open_deck_store).
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from .deck_store import FlashCard, read_decks
+
+MAGIC = b"DKPK"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHIQ")
+CARD_OFFSETS = struct.Struct("<3Q")
+
+
+class DeckPack:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+
+        magic, version, _, deck_count, dir_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a deck pack (format {FORMAT_VERSION})")
+        directory = json.loads(bytes(self._view[dir_offset:]).decode("utf-8"))
+        # deck_id -> {"name", "count", "offsets"}
+        self.decks = {d["id"]: d for d in directory[:deck_count]}
+
+    def cards(self, deck_id):
+        d = self.decks[deck_id]
+        return PackCards(self, d["offsets"], d["count"])
+
+    def _card(self, offsets, i):
+        front, back, end = CARD_OFFSETS.unpack_from(self._mm, offsets + 16 * i)
+        view = self._view
+        return FlashCard(str(view[front:back], "utf-8"), str(view[back:end], "utf-8"))
+
+    def close(self):
+        self._view.release()
+        self._mm.close()
+
+
+class PackCards:
+    """
+    A deck's cards inside a pack, as a read-only sequence: len(), [i],
+    slices and iteration. Each card is decoded when it's accessed.
+    """
+    __slots__ = ("_pack", "_offsets", "_count")
+
+    def __init__(self, pack, offsets, count):
+        self._pack = pack
+        self._offsets = offsets
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._pack._card(self._offsets, j) for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if i < 0 or i >= self._count:
+            raise IndexError("deck index out of range")
+        return self._pack._card(self._offsets, i)
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._pack._card(self._offsets, i)
+
+
+def compile_pack(path, decks):
+    """
+    decks: iterable of (deck_id, name, cards), cards being FlashCards or
+    {"front", "back"} dicts. Written to a temp file, then renamed over path.
+    """
+    tmp = path + ".tmp"
+    directory = []
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0, 0))
+
+        # strings first; remember where each one starts
+        offset_lists = []
+        pos = HEADER.size
+        for deck_id, name, cards in decks:
+            offsets = array("Q", [pos])
+            for c in cards:
+                for text in (c["front"], c["back"]):
+                    data = str(text).encode("utf-8")
+                    f.write(data)
+                    pos += len(data)
+                    offsets.append(pos)
+            offset_lists.append(offsets)
+            directory.append({"id": deck_id, "name": str(name), "count": (len(offsets) - 1) // 2})
+
+        for d, offsets in zip(directory, offset_lists):
+            d["offsets"] = pos
+            if sys.byteorder != "little":
+                offsets.byteswap()
+            f.write(offsets.tobytes())
+            pos += len(offsets) * 8
+
+        f.write(json.dumps(directory, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(directory), pos))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(directory)
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("usage: python -m hub_app.hub.deck_pack decks.json out.pack [deck_id ...]")
+        sys.exit(2)
+    # read-only: the source gets no journal, lock file or sample deck
+    decks, _default_id = read_decks(sys.argv[1])
+    wanted = set(sys.argv[3:])
+    decks = [d for d in decks if not wanted or d[0] in wanted]
+    count = compile_pack(sys.argv[2], decks)
+    print(f"Packed {count} decks into {sys.argv[2]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,192 @@
 # hub/deck_store.py
+import atexit
 import json
+import logging
 import os
+import secrets
+import threading
 import time
+from bisect import bisect_left, insort
+from collections import namedtuple
+from itertools import islice
 
+from .rwlock import RWLock
 from .sample_flashcards import get_sample_flashcards_20
+from .store_common import (  # noqa: F401 (catalogue_name, menu_payload: re-exported for the other stores)
+    CatalogueListing, FileLocking, catalogue_key, catalogue_name, menu_payload, stat_sig,
+)
 
+log = logging.getLogger(__name__)
 
-class DeckStore:
+
+class FlashCard(namedtuple("FlashCard", ["front", "back"])):
+    """
+    One validated, immutable flashcard.
+    card["front"] / card["back"] still work like the old dict cards.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self._fields else default
+
+    def to_dict(self):
+        return {"front": self.front, "back": self.back}
+
+
+def to_flash_cards(cards):
+    # Validates raw cards (dicts from JSON) into FlashCards; bad entries are dropped
+    if not isinstance(cards, list):
+        return []
+    fixed = []
+    for c in cards:
+        if isinstance(c, dict) and "front" in c and "back" in c:
+            fixed.append(FlashCard(str(c["front"]), str(c["back"])))
+    return fixed
+
+
+def new_deck_id(exists):
+    """
+    "deck_<milliseconds>_<random hex>", moved on by 1 ms until
+    exists(deck_id) is False. The random part keeps ids unique across
+    processes that share the decks without asking each other first.
+    Call it under the same lock that guards the decks it checks.
+    """
+    ms = int(time.time() * 1000)
+    tag = secrets.token_hex(3)
+    while exists(f"deck_{ms}_{tag}"):
+        ms += 1
+    return f"deck_{ms}_{tag}"
+
+
+CARD_OVERHEAD = 120   # rough bytes a cached card costs besides its text
+
+
+def estimate_card_bytes(cards):
+    # Rough memory held by cached cards (for the stores' memory budgets)
+    return sum(len(c.front) + len(c.back) + CARD_OVERHEAD for c in cards)
+
+
+def read_decks_file(path):
+    """
+    Parses a decks.json into {"default_flash_deck_id", "decks", ...} with
+    FlashCard cards. Raises (OSError, ValueError, ...) if it's unreadable.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: not a decks file")
+    if "decks" not in data or not isinstance(data["decks"], dict):
+        data["decks"] = {}
+    if "default_flash_deck_id" not in data:
+        data["default_flash_deck_id"] = "sample"
+    for d in data["decks"].values():
+        d["cards"] = to_flash_cards(d.get("cards", []))
+    return data
+
+
+def apply_change(data, rec):
+    """
+    Applies one journal record to decks.json data (as read_decks_file()
+    returns it). Pack decks are read-only. Returns False if nothing changed.
+    """
+    op = rec["op"]
+    deck_id = rec.get("id")
+    decks = data["decks"]
+    d = decks.get(deck_id)
+    writable = d is not None and "pack" not in d
+    if op == "create":
+        decks[deck_id] = {"name": str(rec.get("name", "Untitled")), "cards": []}
+    elif op == "rename" and writable:
+        d["name"] = str(rec["name"])
+    elif op == "add" and writable:
+        d["cards"].append(FlashCard(str(rec["front"]), str(rec["back"])))
+    elif op == "add_many" and writable:
+        d["cards"].extend(FlashCard(str(f), str(b)) for f, b in rec["cards"])
+    elif op == "default" and d is not None:
+        data["default_flash_deck_id"] = deck_id
+    else:
+        return False
+    return True
+
+
+def read_decks(path):
+    """
+    Read-only load of a decks.json and its journal for one-shot tools
+    (deck packs, imports): nothing is locked, written or created, and no
+    sample deck is added. Returns ([(deck_id, name, cards), ...] in menu
+    order, default deck id).
+    """
+    data = {"default_flash_deck_id": "sample", "decks": {}}
+    if os.path.exists(path):
+        data = read_decks_file(path)
+    seq = data.get("journal_seq", 0)
+    try:
+        with open(path + ".journal", "rb") as f:
+            raw = f.read()
+    except OSError:
+        raw = b""
+    for line in raw.splitlines():
+        try:
+            rec = json.loads(line)
+            if rec["n"] <= seq:
+                continue  # already in decks.json
+            apply_change(data, rec)
+            seq = rec["n"]
+        except:
+            # torn line after a crash, or junk
+            continue
+    decks = [(deck_id, str(d.get("name", "Untitled")), d["cards"]) for deck_id, d in data["decks"].items()]
+    decks.sort(key=lambda x: catalogue_key(x[0], x[1]))
+    return decks, data["default_flash_deck_id"]
+
+
+class DeckSnapshot:
+    """
+    Read-only view of one version of a deck: its first `count` cards.
+
+    Decks only grow (add_card appends), so every version is a prefix of the
+    same card list. A new version costs O(1), nothing is copied, and every
+    game reading the deck shares the same snapshot. Old snapshots are freed
+    as soon as no game holds them.
+    """
+    __slots__ = ("deck_id", "version", "_cards", "_count")
+
+    def __init__(self, deck_id, version, cards, count):
+        self.deck_id = deck_id
+        self.version = version
+        self._cards = cards
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return islice(self._cards, self._count)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._count)
+            if start == 0 and step == 1:
+                # prefix: still a snapshot, still no copy
+                if stop == self._count:
+                    return self
+                return DeckSnapshot(self.deck_id, self.version, self._cards, stop)
+            return [self._cards[j] for j in range(start, stop, step)]
+        if i < 0:
+            i += self._count
+        if i < 0 or i >= self._count:
+            raise IndexError("deck index out of range")
+        return self._cards[i]
+
+
+class DeckStore(FileLocking, CatalogueListing):
     """
     Stores multiple flashcard decks in one JSON file.
 
@@ -17,96 +197,592 @@ class DeckStore:
          "sample": {"name": "...", "cards": [{"front":"...","back":"..."}]}
       }
     }
+
+    In memory, each deck's "cards" is a list of FlashCard, validated once on
+    load. get_deck_cards() hands out shared DeckSnapshots (see above).
+
+    Changes are not written by rewriting decks.json. Each one is appended as
+    a single line to a journal next to it (decks.json.journal):
+      {"n": 7, "op": "create", "id": "deck_...", "name": "..."}
+      {"n": 8, "op": "add", "id": "deck_...", "front": "...", "back": "..."}
+      {"n": 9, "op": "default", "id": "deck_..."}
+      {"n": 10, "op": "rename", "id": "deck_...", "name": "..."}
+      {"n": 11, "op": "add_many", "id": "deck_...", "cards": [["front", "back"], ...]}
+    Once the journal is bigger than journal_max_bytes, decks.json is
+    rewritten (it remembers the last "n" it includes) and the journal is
+    emptied. load() reads decks.json, then replays newer journal lines.
+
+    None of that disk I/O happens in the caller: changes are applied in
+    memory and queued, and a background thread writes each burst of them
+    with one append + fsync (after waiting flush_delay seconds for the burst
+    to finish). decks.json is rewritten via a temp file + fsync + rename, so
+    a crash never leaves it half-written. Call flush() (or close()) before
+    exiting to be sure everything is on disk.
+
+    The deck listing is kept as a sorted catalogue (see catalogue_key),
+    updated in place on create / rename, and every change bumps the store
+    version. list_flash_decks() and menu_decks() are built once per version,
+    so menus that are shown over and over cost nothing until a deck changes.
+
+    Decks from read-only deck packs (hub/deck_pack.py, `packs` = their
+    paths) are listed and served like the others, with cards read from the
+    mmap'ed pack. They can't be changed (renames and adds return False) and
+    are never written to decks.json. A deck in decks.json wins over a pack
+    deck with the same id.
+
+    Several processes (the API server, the pygame hub) can share one
+    decks.json: writes are flock()ed and each store picks up the others'
+    changes within poll_interval seconds (see "Other processes" below).
+
+    Thread-safe: readers (listings, card reads) share a reader/writer lock
+    and run in parallel; changes take it exclusively.
     """
 
-    def __init__(self, path="decks.json"):
+    def __init__(self, path="decks.json", journal_max_bytes=1_000_000, flush_delay=0.05,
+                 packs=(), poll_interval=1.0):
         self.path = path
+        self.pack_paths = list(packs)
+        self.journal_path = path + ".journal"
+        self.lock_path = path + ".lock"
+        self.journal_max_bytes = journal_max_bytes
+        self.flush_delay = flush_delay
+        self.poll_interval = poll_interval
         self.data = {"default_flash_deck_id": "sample", "decks": {}}
+        self._versions = {}    # deck_id -> version (bumped on every change)
+        self._snapshots = {}   # deck_id -> DeckSnapshot of the current version
+        self._seq = 0          # "n" of the last journal line read or written
+        self._catalogue = []   # sorted catalogue_key()s of every deck
+        self._version = 0      # store version (bumped on every change)
+        self._listing = None   # (version, list_flash_decks() result)
+        self._menu = None      # (version, menu_decks() result)
+        self._packs = {}       # path -> DeckPack (opened once)
+
+        self._rw = RWLock()                  # guards data, _versions, _snapshots, _catalogue
+        self._cond = threading.Condition()   # guards _pending / _closed
+        self._io_lock = threading.Lock()     # one user of the files at a time (and _seq, below)
+        self._pending = []     # changes not written yet (applied in memory already)
+        self._closed = False
+        self._journal = None   # open journal file (append mode)
+        self._lock_file = None
+        self._generation = 0       # bumped in decks.json by every rewrite
+        self._snapshot_sig = None  # os.stat() signature of decks.json when last read / written
+        self._journal_pos = 0      # journal bytes read so far
+
         self.load()
         self.ensure_sample_deck()
 
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
     def load(self):
+        with self._io_lock, self._file_lock(exclusive=False):
+            self._load_snapshot()
+            self._attach_packs()
+            self._seq = self.data.pop("journal_seq", 0)
+            self._generation = self.data.pop("generation", 0)
+            self._catalogue = sorted(
+                catalogue_key(deck_id, str(d.get("name", "Untitled")))
+                for deck_id, d in self.data["decks"].items()
+            )
+            self._journal_pos = 0
+            self._read_journal_tail()
+            self._snapshots = {}
+
+    def _load_snapshot(self):
+        self._snapshot_sig = stat_sig(self.path)
         if not os.path.exists(self.path):
             return
         try:
-            with open(self.path, "r", encoding="utf-8") as f:
-                self.data = json.load(f)
-            if "decks" not in self.data or not isinstance(self.data["decks"], dict):
-                self.data["decks"] = {}
-            if "default_flash_deck_id" not in self.data:
-                self.data["default_flash_deck_id"] = "sample"
+            self.data = read_decks_file(self.path)
         except:
-            # keep defaults
+            # Unreadable: keep it for a human to look at instead of
+            # overwriting it on the next save, then start from defaults
+            # (the journal below may still bring decks back).
+            bad = f"{self.path}.corrupt-{int(time.time())}"
+            try:
+                os.replace(self.path, bad)
+                log.warning("could not read %s, moved it to %s", self.path, bad)
+            except OSError:
+                pass
             self.data = {"default_flash_deck_id": "sample", "decks": {}}
+            self._snapshot_sig = stat_sig(self.path)
+
+    def _attach_packs(self):
+        # Pack decks go into data["decks"] marked "pack", with a lazy card sequence
+        if not self.pack_paths:
+            return
+        from .deck_pack import DeckPack
+        decks = self.data["decks"]
+        for pack_path in self.pack_paths:
+            pack = self._packs.get(pack_path)
+            if pack is None:
+                try:
+                    pack = DeckPack(pack_path)
+                except (OSError, ValueError) as e:
+                    log.warning("could not open deck pack %s: %s", pack_path, e)
+                    continue
+                self._packs[pack_path] = pack
+            for deck_id, d in pack.decks.items():
+                if deck_id not in decks:
+                    decks[deck_id] = {"name": d["name"], "cards": pack.cards(deck_id), "pack": pack_path}
+
+    def _writable(self, deck_id):
+        d = self.data["decks"].get(deck_id)
+        return d is not None and "pack" not in d
 
     def save(self):
+        """
+        Rewrites decks.json with everything right now and empties the journal.
+        (Normal changes don't need this: the background flusher handles them.)
+        """
+        with self._io_lock, self._file_lock():
+            self._catch_up()
+            self._compact()
+
+    def flush(self):
+        """
+        Writes every queued change before returning (e.g. on shutdown).
+        """
+        with self._io_lock:
+            self._write_pending()
+
+    def _see(self, deck_id):
+        # Before saying a deck doesn't exist, pick up what other processes
+        # wrote: it may have been created there a moment ago
+        with self._rw.read():
+            if deck_id in self.data["decks"]:
+                return
+        self.refresh()
+
+    def refresh(self):
+        """
+        Picks up changes other processes made to decks.json / the journal.
+        The background thread calls this every poll_interval seconds; it's
+        two os.stat() calls when nothing changed.
+        """
+        with self._io_lock:
+            if self._files_changed():
+                with self._file_lock(exclusive=False):
+                    self._catch_up()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self.flush()
+        with self._io_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            self._close_lock_file()
+
+    # --------- Journal ---------
+
+    def _record(self, op, **fields):
+        """
+        Applies one change in memory and queues it for the journal.
+        Call with the write lock held. Its "n" is given when it's written.
+        """
+        rec = {"op": op}
+        rec.update(fields)
+        self._apply(rec)
+        with self._cond:
+            self._pending.append(rec)
+            self._cond.notify_all()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                if not self._pending and not self._closed:
+                    self._cond.wait(self.poll_interval)
+                if self._closed:
+                    return  # close() does the final flush
+                has_pending = bool(self._pending)
+            try:
+                if has_pending:
+                    # let the rest of a burst of changes pile up, then write once
+                    time.sleep(self.flush_delay)
+                    self.flush()
+                else:
+                    self.refresh()
+            except:
+                pass
+
+    def _write_pending(self):
+        # Call with _io_lock held
+        with self._cond:
+            if not self._pending:
+                return
+        with self._file_lock():
+            self._write_pending_locked()
+
+    def _write_pending_locked(self):
+        # Call with _io_lock and the exclusive file lock held.
+        # Other processes may have written since we last looked: read that
+        # first, so our lines get the next free "n"s.
+        self._catch_up()
+        with self._cond:
+            batch = list(self._pending)
+        if not batch:
+            return
+        lines = []
+        for i, rec in enumerate(batch):
+            line = json.dumps(dict(rec, n=self._seq + 1 + i), ensure_ascii=False, separators=(",", ":"))
+            lines.append((line + "\n").encode("utf-8"))
         try:
-            with open(self.path, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=2)
-        except:
+            if self._journal is None:
+                self._journal = open(self.journal_path, "ab")
+            self._journal.write(b"".join(lines))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+        except OSError:
+            # disk trouble: keep the changes and try again next time
+            return
+        self._seq += len(batch)
+        self._journal_pos = self._journal.tell()
+        with self._cond:
+            del self._pending[:len(batch)]
+
+        if self._journal_pos > self.journal_max_bytes:
+            self._compact()
+
+    def _compact(self):
+        # Call with _io_lock and the (exclusive) file lock held, after
+        # _catch_up(). Everything queued so far goes into decks.json, so the
+        # queue and the journal can both be emptied. (Changes queue while
+        # holding the write lock, so under the read lock data and _pending
+        # match.)
+        with self._rw.read(), self._cond:
+            decks = {
+                deck_id: (dict(d), list(d["cards"]))
+                for deck_id, d in self.data["decks"].items()
+                if "pack" not in d
+            }
+            default_id = self.data["default_flash_deck_id"]
+            count = len(self._pending)
+
+        data = self._plain_data(decks, default_id)
+        data["journal_seq"] = self._seq
+        data["generation"] = self._generation + 1
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError:
+            return
+        self._generation += 1
+        self._snapshot_sig = stat_sig(self.path)
+        with self._cond:
+            del self._pending[:count]
+
+        # decks.json now has every change: the journal can start over
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        try:
+            open(self.journal_path, "wb").close()
+        except OSError:
             pass
+        self._journal_pos = 0
+
+    # --------- Other processes ---------
+    #
+    # The API server and the pygame hub may share decks.json. Writes (journal
+    # appends and rewrites) happen under an exclusive flock() on
+    # decks.json.lock, reads of the files under a shared one, and every
+    # journal line gets its "n" from the writer holding the lock, so "n"s
+    # stay in file order across processes.
+    #
+    # Before writing, and every poll_interval seconds, a store checks the
+    # files: if only the journal grew, it applies the new lines (the journal
+    # tail). If decks.json was rewritten (new inode / size / mtime, and a new
+    # generation inside), it reloads, replays the journal, re-applies its own
+    # unwritten changes, and only decks that actually differ get a new
+    # version. Nobody's changes are overwritten either way.
+
+    def _files_changed(self):
+        if stat_sig(self.path) != self._snapshot_sig:
+            return True
+        try:
+            return os.path.getsize(self.journal_path) != self._journal_pos
+        except OSError:
+            return self._journal_pos != 0
+
+    def _catch_up(self):
+        # Call with _io_lock and the file lock held
+        if stat_sig(self.path) != self._snapshot_sig:
+            self._reload()
+            return
+        try:
+            size = os.path.getsize(self.journal_path)
+        except OSError:
+            size = 0
+        if size < self._journal_pos:
+            self._reload()
+        elif size > self._journal_pos:
+            with self._rw.write():
+                self._read_journal_tail()
+
+    def _read_journal_tail(self):
+        # Applies journal lines after _journal_pos. Call with _io_lock and
+        # the write lock held (or from load()).
+        try:
+            with open(self.journal_path, "rb") as f:
+                f.seek(self._journal_pos)
+                raw = f.read()
+        except OSError:
+            return
+        end = raw.rfind(b"\n") + 1   # a line still being written waits for next time
+        for line in raw[:end].splitlines():
+            try:
+                rec = json.loads(line)
+                n = rec["n"]
+                if n <= self._seq:
+                    continue  # already in decks.json
+                self._apply(rec)
+                self._seq = n
+            except:
+                # torn line after a crash, or junk
+                continue
+        self._journal_pos += end
+
+    def _reload(self):
+        # decks.json was rewritten by another process. Call with _io_lock and
+        # the file lock held.
+        with self._rw.write():
+            old_decks = self.data["decks"]
+            old_default = self.data.get("default_flash_deck_id")
+            old_versions = dict(self._versions)
+
+            self.data = {"default_flash_deck_id": "sample", "decks": {}}
+            self._load_snapshot()
+            self._attach_packs()
+            self._seq = self.data.pop("journal_seq", 0)
+            self._generation = self.data.pop("generation", 0)
+            self._journal_pos = 0
+            self._read_journal_tail()
+            with self._cond:
+                for rec in self._pending:
+                    self._apply(rec)   # ours, not written yet
+
+            # Keep unchanged decks as they were (same objects, versions,
+            # snapshots); only the others count as changed
+            self._versions = old_versions
+            decks = self.data["decks"]
+            for deck_id in set(old_decks) | set(decks):
+                if _same_deck(old_decks.get(deck_id), decks.get(deck_id)):
+                    decks[deck_id] = old_decks[deck_id]
+                else:
+                    self._changed(deck_id)
+            if self.data.get("default_flash_deck_id") != old_default:
+                self._version += 1
+            self._catalogue = sorted(
+                catalogue_key(deck_id, str(d.get("name", "Untitled")))
+                for deck_id, d in decks.items()
+            )
+
+    def _apply(self, rec):
+        # Used for new changes and for journal replay alike
+        deck_id = rec.get("id")
+        old = self.data["decks"].get(deck_id)
+        old_name = str(old.get("name", "Untitled")) if old is not None else None
+        if not apply_change(self.data, rec):
+            return
+        name = str(self.data["decks"][deck_id].get("name", "Untitled"))
+        if name != old_name:
+            # created or renamed: move it in the catalogue
+            if old_name is not None:
+                self._uncatalogue(catalogue_key(deck_id, old_name))
+            insort(self._catalogue, catalogue_key(deck_id, name))
+        self._changed(deck_id)
+
+    def _uncatalogue(self, key):
+        i = bisect_left(self._catalogue, key)
+        if i < len(self._catalogue) and self._catalogue[i] == key:
+            del self._catalogue[i]
+
+    def _plain_data(self, decks, default_id):
+        # decks: {deck_id: (deck dict, cards)} -> decks.json data, with
+        # FlashCards turned back into {"front", "back"} dicts
+        plain_decks = {}
+        for deck_id, (plain, cards) in decks.items():
+            plain["cards"] = [c.to_dict() for c in cards]
+            plain_decks[deck_id] = plain
+        return {"default_flash_deck_id": default_id, "decks": plain_decks}
 
     def ensure_sample_deck(self):
-        if "sample" not in self.data["decks"]:
-            self.data["decks"]["sample"] = {
-                "name": "Sample Deck (20)",
-                "cards": get_sample_flashcards_20()
-            }
-            self.data["default_flash_deck_id"] = "sample"
-            self.save()
-
-    def list_flash_decks(self):
-        # returns list of (deck_id, name, count)
-        result = []
-        for deck_id, d in self.data["decks"].items():
-            name = str(d.get("name", "Untitled"))
-            cards = d.get("cards", [])
-            count = len(cards) if isinstance(cards, list) else 0
-            result.append((deck_id, name, count))
-        # stable ordering: sample first, then by name
-        result.sort(key=lambda x: (0 if x[0] == "sample" else 1, x[1].lower()))
-        return result
+        with self._rw.write():
+            if "sample" in self.data["decks"]:
+                return
+            cards = to_flash_cards(get_sample_flashcards_20())
+            self._record("create", id="sample", name="Sample Deck (20)")
+            self._record("add_many", id="sample", cards=[[c.front, c.back] for c in cards])
+            self._record("default", id="sample")
+        self.save()
 
-    def get_default_flash_deck_id(self):
+    def get_store_version(self):
+        with self._rw.read():
+            return self._version
+
+    # list_flash_decks(), list_flash_decks_page(), menu_decks(): CatalogueListing
+
+    def _before_read(self):
+        pass   # other processes' changes come in from the background thread
+
+    def _deck_row(self, deck_id):
+        d = self.data["decks"][deck_id]
+        return str(d.get("name", "Untitled")), len(d["cards"])
+
+    def _default_id_locked(self):
         deck_id = self.data.get("default_flash_deck_id", "sample")
         if deck_id not in self.data["decks"]:
             return "sample"
         return deck_id
 
+    def get_default_flash_deck_id(self):
+        with self._rw.read():
+            return self._default_id_locked()
+
     def set_default_flash_deck(self, deck_id):
-        if deck_id in self.data["decks"]:
-            self.data["default_flash_deck_id"] = deck_id
-            self.save()
-            return True
-        return False
+        self._see(deck_id)
+        with self._rw.write():
+            if deck_id not in self.data["decks"]:
+                return False
+            self._record("default", id=deck_id)
+        return True
 
     def get_deck(self, deck_id):
-        return self.data["decks"].get(deck_id)
+        self._see(deck_id)
+        with self._rw.read():
+            return self.data["decks"].get(deck_id)
+
+    def get_deck_version(self, deck_id):
+        with self._rw.read():
+            return self._versions.get(deck_id, 0)
 
     def get_deck_cards(self, deck_id):
-        d = self.get_deck(deck_id)
-        if not d:
-            return []
-        cards = d.get("cards", [])
-        if not isinstance(cards, list):
-            return []
-        # ensure strings
-        fixed = []
-        for c in cards:
-            if isinstance(c, dict) and "front" in c and "back" in c:
-                fixed.append({"front": str(c["front"]), "back": str(c["back"])})
-        return fixed
+        """
+        Returns the current DeckSnapshot of the deck (empty if unknown).
+        Immutable and shared: callers must not (and can't) modify it.
+        """
+        self._see(deck_id)
+        with self._rw.read():
+            snap = self._snapshots.get(deck_id)
+            if snap is not None:
+                return snap
+
+            d = self.data["decks"].get(deck_id)
+            cards = d["cards"] if d else []
+            snap = DeckSnapshot(deck_id, self._versions.get(deck_id, 0), cards, len(cards))
+            if d:
+                # two readers may both build it: same result, either one wins
+                self._snapshots[deck_id] = snap
+            return snap
+
+    def get_cards_page(self, deck_id, start, limit):
+        """
+        Cards start .. start+limit-1 of a deck and its card count, or None if
+        the deck doesn't exist. Cards are only ever appended, so a position
+        always points at the same card. O(limit).
+        """
+        self._see(deck_id)
+        with self._rw.read():
+            d = self.data["decks"].get(deck_id)
+            if d is None:
+                return None
+            cards = d["cards"]
+            return cards[start:start + limit], len(cards)
+
+    def _changed(self, deck_id):
+        # New version; the old snapshot stays valid for whoever holds it
+        self._versions[deck_id] = self._versions.get(deck_id, 0) + 1
+        self._version += 1
+        self._snapshots.pop(deck_id, None)
 
     def create_deck(self, name):
-        # simple unique id
-        deck_id = "deck_" + str(int(time.time() * 1000))
-        self.data["decks"][deck_id] = {"name": str(name), "cards": []}
-        self.save()
+        # Queued like any other change; new_deck_id()'s random part keeps
+        # another process from picking the same id meanwhile
+        with self._rw.write():
+            deck_id = new_deck_id(lambda i: i in self.data["decks"])
+            self._record("create", id=deck_id, name=str(name))
         return deck_id
 
+    def rename_deck(self, deck_id, name):
+        self._see(deck_id)
+        with self._rw.write():
+            if not self._writable(deck_id):
+                return False
+            self._record("rename", id=deck_id, name=str(name))
+        return True
+
     def add_card(self, deck_id, front, back):
-        if deck_id not in self.data["decks"]:
-            return False
-        self.data["decks"][deck_id]["cards"].append({"front": str(front), "back": str(back)})
-        self.save()
+        self._see(deck_id)
+        with self._rw.write():
+            if not self._writable(deck_id):
+                return False
+            self._record("add", id=deck_id, front=str(front), back=str(back))
+        return True
+
+    def add_cards(self, deck_id, cards):
+        """
+        Appends many (front, back) cards as one change: one journal line,
+        one write. Returns False if the deck doesn't exist (or is read-only).
+        """
+        cards = [[str(front), str(back)] for front, back in cards]
+        self._see(deck_id)
+        with self._rw.write():
+            if not self._writable(deck_id):
+                return False
+            if cards:
+                self._record("add_many", id=deck_id, cards=cards)
         return True
+
+
+def _same_deck(a, b):
+    # Two in-memory decks with the same name and cards (None: no deck)
+    if a is None or b is None:
+        return a is b
+    if a.get("name") != b.get("name") or a.get("pack") != b.get("pack"):
+        return False
+    return "pack" in a or a["cards"] == b["cards"]
+
+
+def open_deck_store(json_path="decks.json", backend=None, db_path=None):
+    """
+    Deck storage picked by configuration:
+      DECK_STORE_BACKEND = "json" (default): DeckStore(json_path)
+      DECK_STORE_BACKEND = "sqlite": SqliteDeckStore(DECK_STORE_DB or "decks.db"),
+                           at most DECK_STORE_MEMORY_MB (default 64) of
+                           cards cached; imports json_path the first time
+      DECK_STORE_BACKEND = "sharded": ShardedDeckStore(DECK_STORE_DIR or "decks"),
+                           one file per deck, at most DECK_STORE_MEMORY_MB
+                           (default 64) of cards in memory; imports
+                           json_path the first time
+    DECK_PACKS = pack files to serve read-only, separated by os.pathsep
+    (json backend). DECK_STORE_POLL = seconds between checks for changes
+    made by other processes sharing the files (json and sharded backends,
+    default 1).
+    """
+    backend = backend or os.environ.get("DECK_STORE_BACKEND", "json")
+    poll = float(os.environ.get("DECK_STORE_POLL", "1.0"))
+    budget = float(os.environ.get("DECK_STORE_MEMORY_MB", "64")) * 1024 * 1024
+    if backend == "sqlite":
+        from .sqlite_deck_store import SqliteDeckStore
+        db_path = db_path or os.environ.get("DECK_STORE_DB", "decks.db")
+        return SqliteDeckStore(db_path, memory_budget=int(budget), import_from=json_path)
+    if backend == "sharded":
+        from .sharded_deck_store import ShardedDeckStore
+        return ShardedDeckStore(
+            os.environ.get("DECK_STORE_DIR", "decks"),
+            memory_budget=int(budget),
+            import_from=json_path,
+            poll_interval=poll,
+        )
+    packs = [p for p in os.environ.get("DECK_PACKS", "").split(os.pathsep) if p]
+    return DeckStore(json_path, packs=packs, poll_interval=poll)
@@ -7,9 +7,8 @@
 #     * Card game mode (uses cardgame_app.cardgame.engine.GameEngine)
 # - Designed so your pygame screens call methods here rather than owning game logic.
 
-import random
-
-from .deck_store import DeckStore
+from .deck_store import open_deck_store
+from .permutation import Permutation, new_seed
 from .game_engine import GameEngine
 
 
@@ -23,14 +22,15 @@ class FlashcardQuestionCycler:
     cards: list of dicts like {"front": "...", "back": "..."}
     """
     def __init__(self, cards):
-        self.cards = cards[:] if cards else []
+        # deck snapshots are immutable and shared: no copy
+        self.cards = cards if cards is not None else []
         self.order = []
         self.pos = 0
         self._reshuffle()
 
     def _reshuffle(self):
-        self.order = list(range(len(self.cards)))
-        random.shuffle(self.order)
+        # computed per position: no list of len(cards) indices
+        self.order = Permutation(new_seed(), len(self.cards))
         self.pos = 0
 
     def next(self):
@@ -80,11 +80,11 @@ class CardGameSession:
             "boss_max_hp": self.engine.boss.max_hp,
             "boss_resists": self.engine.boss.resistant_to,
             "shields": dict(self.engine.player.shields),
-            "hand": [c.to_short_text() for c in self.engine.player.hand],
+            "hand": self.engine.hand_labels(),
             "questions_left": self.questions_left,
             "current_question": self.current_q,
             "message": self.message,
-            "log": list(self.engine.log_lines),
+            "log": self.engine.log_lines,
             "game_over": bool(self.engine.game_over),
             "winner": self.engine.winner,
         }
@@ -112,7 +112,7 @@ class CardGameSession:
             self.engine.grant_mana_for_correct_answer()
             self.message = "Correct! +3 mana."
         else:
-            self.engine._log("Wrong. +0 mana.")
+            self.engine._log("wrong")
             self.message = "Wrong. +0 mana."
 
         self.questions_left -= 1
@@ -176,7 +176,8 @@ class FlashcardsSession:
       - read get_state()
     """
     def __init__(self, cards):
-        self.cards = cards[:] if cards else []
+        # deck snapshots are immutable and shared: no copy
+        self.cards = cards if cards is not None else []
 
         self.mode = "browse"  # "browse" | "quiz" | "feedback" | "done"
         self.index = 0
@@ -246,8 +247,7 @@ class FlashcardsSession:
         if len(self.cards) == 0:
             return False
         self.mode = "quiz"
-        self.q_order = list(range(len(self.cards)))
-        random.shuffle(self.q_order)
+        self.q_order = Permutation(new_seed(), len(self.cards))
         self.q_pos = 0
         self.score = 0
         self.feedback = None
@@ -288,8 +288,9 @@ class HubEngine:
     The main engine/controller for the whole app.
     Your pygame App object should create ONE HubEngine and share it across screens.
     """
-    def __init__(self, deck_store_path="decks.json"):
-        self.store = DeckStore(deck_store_path)
+    def __init__(self, deck_store_path="decks.json", deck_backend=None):
+        # deck_backend: "json" or "sqlite" (default: DECK_STORE_BACKEND env var)
+        self.store = open_deck_store(deck_store_path, deck_backend)
         self.mode = "menu"     # "menu" | "card_game" | "flashcards" | "multiplayer"
         self.session = None    # CardGameSession or FlashcardsSession
         self.message = ""
@@ -311,20 +312,13 @@ class HubEngine:
     def list_decks(self):
         """
         Returns a dict you can show in UI, including which deck is default.
+        (Built once per deck store version; the deck list inside is shared.)
         """
-        default_id = self.store.get_default_flash_deck_id()
-        flash = []
-        for deck_id, name, count in self.store.list_flash_decks():
-            flash.append({
-                "id": deck_id,
-                "name": name,
-                "count": count,
-                "is_default": (deck_id == default_id),
-            })
+        menu = self.store.menu_decks()
         return {
             "card_game_deck": {"name": "Mana Boss Deck", "count": 40},
-            "flash_decks": flash,
-            "default_flash_deck_id": default_id,
+            "flash_decks": menu["flash_decks"],
+            "default_flash_deck_id": menu["default_flash_deck_id"],
         }
 
     def set_default_flash_deck(self, deck_id):
@@ -1,18 +1,31 @@
 # hub_app/hub/game_engine.py
 import random
+import struct
+from array import array
+from collections import namedtuple
+
+from cardgame_app.cardgame.game_log import GameLog
+
+from .permutation import Permutation, new_seed
 
 
 # ----------------------------
 # Simple data classes (junior-friendly)
 # ----------------------------
 
-class Card:
-    def __init__(self, name, card_type, cost=5, element=None, power=0):
-        self.name = name
-        self.card_type = card_type      # "attack", "block", "draw", "random"
-        self.cost = cost
-        self.element = element          # "fire", "water", "ice", "arcane", or None
-        self.power = power              # damage amount (for attacks)
+class Card(namedtuple("Card", ["name", "card_type", "cost", "element", "power"])):
+    """
+    Immutable card definition.
+    There is one shared instance per kind of card (see CARDS); piles and the
+    hand only store indices into CARDS.
+    """
+    __slots__ = ()
+
+    def __new__(cls, name, card_type, cost=5, element=None, power=0):
+        # card_type: "attack", "block", "draw", "random"
+        # element: "fire", "water", "ice", "arcane", or None
+        # power: damage amount (for attacks)
+        return super().__new__(cls, name, card_type, cost, element, power)
 
     def to_short_text(self):
         # Keep it short for your hand UI
@@ -27,7 +40,62 @@ class Card:
         return self.name
 
 
+# Every kind of card in the game (shared by all games)
+CARDS = (
+    Card("Fire Attack", "attack", 5, "fire", 12),   # 0
+    Card("Water Attack", "attack", 5, "water", 12), # 1
+    Card("Ice Attack", "attack", 5, "ice", 12),     # 2
+    Card("Draw Two", "draw", 5, None, 0),           # 3
+    Card("Block Fire", "block", 5, "fire", 0),      # 4
+    Card("Block Water", "block", 5, "water", 0),    # 5
+    Card("Block Ice", "block", 5, "ice", 0),        # 6
+    Card("Random", "random", 5, "arcane", 0),       # 7
+)
+
+# Display labels, built once (same order as CARDS)
+CARD_LABELS = tuple(c.to_short_text() for c in CARDS)
+
+# The 40-card deck as indices into CARDS (same order it was always built in)
+DEFAULT_DECK = (0, 1, 2) * 5 + (3,) * 5 + (4, 5, 6) * 5 + (7,) * 5
+
+ELEMENTS = ("fire", "water", "ice", "arcane")
+WINNERS = (None, "player", "boss")
+
+# Game log messages: code -> template (or function) for GameLog.
+# The engine only stores the code + args; text is built when the log is read.
+LOG_MESSAGES = {
+    "reshuffle": "Reshuffled discard into draw pile.",
+    "turn_begins": "Turn {0} begins. Boss resists {1}.",
+    "drew_to_5": "Drew up to 5 cards.",
+    "drew_1": "Drew 1 card.",
+    "correct": "Correct answer: +3 mana.",
+    "wrong": "Wrong. +0 mana.",
+    "resisted": "Boss resisted {0}! Damage halved.",
+    "attack": lambda card, dmg: f"Player used {CARD_LABELS[card]} for {dmg} damage.",
+    "shield": "Player gained 1 {0} shield.",
+    "drew_2": "Player drew 2 cards.",
+    "unknown_card": "Played an unknown card.",
+    "random_heal": "Random: healed {0} HP.",
+    "random_mana": "Random: gained {0} mana.",
+    "random_damage": "Random: dealt {0} arcane damage.",
+    "random_draw": "Random: drew 1 card.",
+    "random_shield": "Random: gained 1 {0} shield.",
+    "boss_blocked": "Boss cast {0}. Player shield blocked it!",
+    "boss_hit": "Boss cast {0} for {1} damage!",
+    "player_defeated": "Player was defeated.",
+    "boss_defeated": "Boss was defeated!",
+}
+LOG_CAPACITY = 200
+
+
+def new_pile(cards=()):
+    # Compact pile: one byte per card (an index into CARDS)
+    return array("B", cards)
+
+
 class Player:
+    __slots__ = ("max_hp", "hp", "mana", "shields", "hand")
+
     def __init__(self):
         self.max_hp = 60
         self.hp = self.max_hp
@@ -42,10 +110,13 @@ class Player:
             "arcane": 0,
         }
 
-        self.hand = []
+        # indices into CARDS
+        self.hand = new_pile()
 
 
 class Boss:
+    __slots__ = ("max_hp", "hp", "resistant_to")
+
     def __init__(self):
         self.max_hp = 90
         self.hp = self.max_hp
@@ -66,6 +137,8 @@ class GameEngine:
     - Cards cost 5 mana.
     - Boss resists one of 4 types each turn (fire/water/ice/arcane) => 50% damage.
     - Player gains mana via flashcard questions (grant_mana_for_correct_answer = +3).
+    - All randomness comes from self.rng, seeded by `seed`, so the same seed
+      plus the same actions always replays the same game.
     - Deck: 40 cards
         * 5 Fire attack, 5 Water attack, 5 Ice attack (15)
         * 5 Draw +2 (5)
@@ -74,19 +147,24 @@ class GameEngine:
         = 40
     """
 
-    def __init__(self):
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
         self.player = Player()
         self.boss = Boss()
 
         self.turn_number = 0
-        self.log_lines = []
+        self.log = GameLog(LOG_MESSAGES, LOG_CAPACITY)
 
         self.game_over = False
         self.winner = None  # "player" or "boss"
 
-        # Card piles
-        self.draw_pile = []
-        self.discard_pile = []
+        # Card piles (indices into CARDS)
+        self.draw_pile = new_pile()
+        self.discard_pile = new_pile()
 
         self._build_default_deck()
         self._shuffle_draw_pile()
@@ -98,47 +176,30 @@ class GameEngine:
 
     # --------- Logging ---------
 
-    def _log(self, msg):
-        self.log_lines.append(msg)
-        # Keep log from growing forever
-        if len(self.log_lines) > 200:
-            self.log_lines = self.log_lines[-200:]
+    def _log(self, code, *args):
+        # Cheap: no text is built here (see LOG_MESSAGES)
+        self.log.add(code, *args)
+
+    @property
+    def log_lines(self):
+        # Log as text, oldest first (for UIs)
+        return self.log.lines()
 
     # --------- Deck building ---------
 
     def _build_default_deck(self):
-        self.draw_pile = []
-        self.discard_pile = []
-
-        # Attacks (5 each)
-        for _ in range(5):
-            self.draw_pile.append(Card("Fire Attack", "attack", 5, "fire", 12))
-            self.draw_pile.append(Card("Water Attack", "attack", 5, "water", 12))
-            self.draw_pile.append(Card("Ice Attack", "attack", 5, "ice", 12))
-
-        # Draw +2 (5)
-        for _ in range(5):
-            self.draw_pile.append(Card("Draw Two", "draw", 5, None, 0))
-
-        # Blocks (5 each for 3 elements)
-        for _ in range(5):
-            self.draw_pile.append(Card("Block Fire", "block", 5, "fire", 0))
-            self.draw_pile.append(Card("Block Water", "block", 5, "water", 0))
-            self.draw_pile.append(Card("Block Ice", "block", 5, "ice", 0))
-
-        # Random (5)
-        for _ in range(5):
-            self.draw_pile.append(Card("Random", "random", 5, "arcane", 0))
+        self.draw_pile = new_pile(DEFAULT_DECK)
+        self.discard_pile = new_pile()
 
     def _shuffle_draw_pile(self):
-        random.shuffle(self.draw_pile)
+        self.rng.shuffle(self.draw_pile)
 
     def _reshuffle_from_discard(self):
         if len(self.draw_pile) == 0 and len(self.discard_pile) > 0:
             self.draw_pile = self.discard_pile[:]
-            self.discard_pile = []
+            self.discard_pile = new_pile()
             self._shuffle_draw_pile()
-            self._log("Reshuffled discard into draw pile.")
+            self._log("reshuffle")
 
     def _draw_cards(self, n):
         for _ in range(n):
@@ -156,22 +217,30 @@ class GameEngine:
         self.turn_number += 1
 
         # Boss changes resistance each turn
-        self.boss.resistant_to = random.choice(["fire", "water", "ice", "arcane"])
-        self._log(f"Turn {self.turn_number} begins. Boss resists {self.boss.resistant_to}.")
+        self.boss.resistant_to = self.rng.choice(["fire", "water", "ice", "arcane"])
+        self._log("turn_begins", self.turn_number, self.boss.resistant_to)
 
         # Draw rules: turn 1 draw to 5; later turns draw 1
         if self.turn_number == 1:
             while len(self.player.hand) < 5:
                 self._draw_cards(1)
-            self._log("Drew up to 5 cards.")
+            self._log("drew_to_5")
         else:
             self._draw_cards(1)
-            self._log("Drew 1 card.")
+            self._log("drew_1")
 
     def grant_mana_for_correct_answer(self):
         # Your screens.py calls this
         self.player.mana += 3
-        self._log("Correct answer: +3 mana.")
+        self._log("correct")
+
+    def hand_cards(self):
+        # Card definitions for the current hand (for UIs / snapshots)
+        return [CARDS[i] for i in self.player.hand]
+
+    def hand_labels(self):
+        # Short text for each card in the hand (precomputed, see CARD_LABELS)
+        return [CARD_LABELS[i] for i in self.player.hand]
 
     # --------- Actions ---------
 
@@ -182,7 +251,8 @@ class GameEngine:
         if index < 0 or index >= len(self.player.hand):
             return False, "Invalid card."
 
-        card = self.player.hand[index]
+        card_index = self.player.hand[index]
+        card = CARDS[card_index]
 
         if self.player.mana < card.cost:
             return False, "Not enough mana (need 5)."
@@ -191,23 +261,23 @@ class GameEngine:
         self.player.mana -= card.cost
 
         # Remove from hand and discard it
-        played = self.player.hand.pop(index)
-        self.discard_pile.append(played)
+        self.discard_pile.append(self.player.hand.pop(index))
 
         # Resolve effect
-        msg = self._resolve_card(played)
+        msg = self._resolve_card(card_index)
         self._check_game_over()
         return True, msg
 
-    def _resolve_card(self, card):
+    def _resolve_card(self, card_index):
+        card = CARDS[card_index]
         if card.card_type == "attack":
             dmg = card.power
             if card.element == self.boss.resistant_to:
                 dmg = int(dmg * 0.5)
-                self._log(f"Boss resisted {card.element}! Damage halved.")
+                self._log("resisted", card.element)
 
             self.boss.hp -= dmg
-            self._log(f"Player used {card.to_short_text()} for {dmg} damage.")
+            self._log("attack", card_index, dmg)
             return f"Dealt {dmg} damage."
 
         if card.card_type == "block":
@@ -215,55 +285,55 @@ class GameEngine:
             if card.element not in self.player.shields:
                 self.player.shields[card.element] = 0
             self.player.shields[card.element] += 1
-            self._log(f"Player gained 1 {card.element} shield.")
+            self._log("shield", card.element)
             return f"Shielded against {card.element}."
 
         if card.card_type == "draw":
             self._draw_cards(2)
-            self._log("Player drew 2 cards.")
+            self._log("drew_2")
             return "Drew 2 cards."
 
         if card.card_type == "random":
             return self._resolve_random_card()
 
-        self._log("Played an unknown card.")
+        self._log("unknown_card")
         return "Played a card."
 
     def _resolve_random_card(self):
         # Simple random effects
-        roll = random.randint(1, 5)
+        roll = self.rng.randint(1, 5)
 
         if roll == 1:
             heal = 8
             self.player.hp = min(self.player.max_hp, self.player.hp + heal)
-            self._log(f"Random: healed {heal} HP.")
+            self._log("random_heal", heal)
             return f"Random: healed {heal} HP."
 
         if roll == 2:
             mana = 5
             self.player.mana += mana
-            self._log(f"Random: gained {mana} mana.")
+            self._log("random_mana", mana)
             return f"Random: gained {mana} mana."
 
         if roll == 3:
-            dmg = random.randint(6, 16)
+            dmg = self.rng.randint(6, 16)
             # Treat as "arcane" damage (affected by arcane resist)
             if self.boss.resistant_to == "arcane":
                 dmg = int(dmg * 0.5)
-                self._log("Boss resisted arcane! Damage halved.")
+                self._log("resisted", "arcane")
             self.boss.hp -= dmg
-            self._log(f"Random: dealt {dmg} arcane damage.")
+            self._log("random_damage", dmg)
             return f"Random: dealt {dmg} damage."
 
         if roll == 4:
             self._draw_cards(1)
-            self._log("Random: drew 1 card.")
+            self._log("random_draw")
             return "Random: drew 1 card."
 
         # roll == 5
-        elem = random.choice(["fire", "water", "ice"])
+        elem = self.rng.choice(["fire", "water", "ice"])
         self.player.shields[elem] += 1
-        self._log(f"Random: gained 1 {elem} shield.")
+        self._log("random_shield", elem)
         return f"Random: gained 1 {elem} shield."
 
     def end_player_turn_and_boss_acts(self):
@@ -271,16 +341,16 @@ class GameEngine:
             return
 
         # Boss basic magic attack
-        elem = random.choice(["fire", "water", "ice", "arcane"])
+        elem = self.rng.choice(["fire", "water", "ice", "arcane"])
         base = 10
 
         # Shields can block matching element
         if elem in self.player.shields and self.player.shields[elem] > 0:
             self.player.shields[elem] -= 1
-            self._log(f"Boss cast {elem}. Player shield blocked it!")
+            self._log("boss_blocked", elem)
         else:
             self.player.hp -= base
-            self._log(f"Boss cast {elem} for {base} damage!")
+            self._log("boss_hit", elem, base)
 
         self._check_game_over()
 
@@ -289,12 +359,99 @@ class GameEngine:
             self.player.hp = 0
             self.game_over = True
             self.winner = "boss"
-            self._log("Player was defeated.")
+            self._log("player_defeated")
         elif self.boss.hp <= 0 and not self.game_over:
             self.boss.hp = 0
             self.game_over = True
             self.winner = "player"
-            self._log("Boss was defeated!")
+            self._log("boss_defeated")
+
+    # ----------------------------
+    # Compact binary form (session offload / replication)
+    # ----------------------------
+
+    # version, seed, turn, game_over, winner,
+    # player hp/max_hp/mana, shields x4, boss hp/max_hp/resist,
+    # len(hand), len(draw), len(discard)
+    _HEADER = struct.Struct("<BQIBBiiI4IiiBBBB")
+    _FORMAT_VERSION = 2
+
+    def to_bytes(self):
+        """
+        Packs the whole game (including the rng state and log) into bytes.
+        Flashcards loaded with set_flashcards() are not included.
+        """
+        p = self.player
+        b = self.boss
+        parts = [self._HEADER.pack(
+            self._FORMAT_VERSION, self.seed, self.turn_number, int(self.game_over), WINNERS.index(self.winner),
+            p.hp, p.max_hp, p.mana, *[p.shields.get(e, 0) for e in ELEMENTS],
+            b.hp, b.max_hp, ELEMENTS.index(b.resistant_to),
+            len(p.hand), len(self.draw_pile), len(self.discard_pile),
+        )]
+        parts.append(p.hand.tobytes())
+        parts.append(self.draw_pile.tobytes())
+        parts.append(self.discard_pile.tobytes())
+
+        # rng state: (version, 625 x uint32, gauss_next)
+        version, internal, gauss = self.rng.getstate()
+        parts.append(struct.pack("<B", version))
+        parts.append(array("I", internal).tobytes())
+        parts.append(struct.pack("<?d", gauss is not None, gauss or 0.0))
+
+        log = self.log.to_bytes()
+        parts.append(struct.pack("<I", len(log)))
+        parts.append(log)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Inverse of to_bytes(). Raises ValueError for any other format version.
+        """
+        if not data or data[0] != cls._FORMAT_VERSION:
+            raise ValueError(f"unsupported game format version: {data[0] if data else None}")
+        g = cls.__new__(cls)
+        (_, g.seed, g.turn_number, game_over, winner,
+         hp, max_hp, mana, s_fire, s_water, s_ice, s_arcane,
+         boss_hp, boss_max_hp, resist,
+         n_hand, n_draw, n_discard) = cls._HEADER.unpack_from(data, 0)
+        pos = cls._HEADER.size
+
+        g.game_over = bool(game_over)
+        g.winner = WINNERS[winner]
+
+        g.player = Player()
+        g.player.hp, g.player.max_hp, g.player.mana = hp, max_hp, mana
+        g.player.shields = dict(zip(ELEMENTS, (s_fire, s_water, s_ice, s_arcane)))
+        g.boss = Boss()
+        g.boss.hp, g.boss.max_hp, g.boss.resistant_to = boss_hp, boss_max_hp, ELEMENTS[resist]
+
+        g.player.hand = new_pile(data[pos:pos + n_hand])
+        pos += n_hand
+        g.draw_pile = new_pile(data[pos:pos + n_draw])
+        pos += n_draw
+        g.discard_pile = new_pile(data[pos:pos + n_discard])
+        pos += n_discard
+
+        rng_version = data[pos]
+        pos += 1
+        internal = array("I")
+        internal.frombytes(data[pos:pos + 625 * internal.itemsize])
+        pos += 625 * internal.itemsize
+        has_gauss, gauss = struct.unpack_from("<?d", data, pos)
+        pos += struct.calcsize("<?d")
+        g.rng = random.Random()
+        g.rng.setstate((rng_version, tuple(internal), gauss if has_gauss else None))
+
+        (n_log,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        g.log = GameLog.from_bytes(data[pos:pos + n_log], LOG_MESSAGES, LOG_CAPACITY)
+
+        g.flashcards = []
+        g._q_order = []
+        g._q_pos = 0
+        return g
 
     # ----------------------------
     # OPTIONAL: flashcards inside this engine
@@ -306,8 +463,7 @@ class GameEngine:
         flashcards: list like [{"front": "...", "back": "..."}, ...]
         """
         self.flashcards = flashcards[:] if flashcards else []
-        self._q_order = list(range(len(self.flashcards)))
-        random.shuffle(self._q_order)
+        self._q_order = Permutation(new_seed(self.rng), len(self.flashcards))
         self._q_pos = 0
 
     def next_flashcard(self):
@@ -317,7 +473,7 @@ class GameEngine:
         if len(self.flashcards) == 0:
             return None, None
         if self._q_pos >= len(self._q_order):
-            random.shuffle(self._q_order)
+            self._q_order = Permutation(new_seed(self.rng), len(self.flashcards))
             self._q_pos = 0
         idx = self._q_order[self._q_pos]
         self._q_pos += 1
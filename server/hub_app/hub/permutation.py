@@ -0,0 +1,78 @@
+# hub/permutation.py
+# A shuffled order of range(n) that is never stored.
+#
+#   perm = Permutation(seed, n)
+#   perm.index_at(pos)   # the pos-th item of the shuffled order, O(1)
+#
+# Same (seed, n) -> same order, every run and on every machine, so a quiz
+# or question cycler only needs to remember (seed, pos) instead of a list
+# of n indices.
+#
+# How: a small keyed Feistel network shuffles the numbers 0 .. 4^k - 1
+# (the smallest power of 4 >= n). Numbers that land outside range(n) are
+# fed through the network again ("cycle walking") until they land inside.
+# 4^k < 4n, so that takes a few steps at most on average.
+
+import random
+
+ROUNDS = 4
+
+
+def new_seed(rng=random):
+    # 53 bits: survives a round trip through JSON / JavaScript numbers
+    return rng.getrandbits(53)
+
+
+class Permutation:
+    __slots__ = ("seed", "n", "_half_bits", "_mask", "_keys")
+
+    def __init__(self, seed, n):
+        self.seed = seed
+        self.n = n
+
+        # both halves need the same number of bits
+        bits = max(2, (n - 1).bit_length())
+        bits += bits % 2
+        self._half_bits = bits // 2
+        self._mask = (1 << self._half_bits) - 1
+
+        key_rng = random.Random(seed)
+        self._keys = tuple(key_rng.getrandbits(32) for _ in range(ROUNDS))
+
+    def index_at(self, pos):
+        if pos < 0 or pos >= self.n:
+            raise IndexError("permutation index out of range")
+        x = pos
+        while True:
+            x = self._encrypt(x)
+            if x < self.n:
+                return x
+
+    def _encrypt(self, x):
+        half = self._half_bits
+        mask = self._mask
+        left = x >> half
+        right = x & mask
+        for key in self._keys:
+            left, right = right, left ^ (_mix(right, key) & mask)
+        return (left << half) | right
+
+    # Lets a Permutation stand in for the old shuffled list: order[pos], len(order)
+    def __getitem__(self, pos):
+        return self.index_at(pos)
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        for pos in range(self.n):
+            yield self.index_at(pos)
+
+
+def _mix(x, key):
+    # cheap 32-bit integer hash (round function)
+    h = (x * 0x9E3779B1 + key) & 0xFFFFFFFF
+    h ^= h >> 15
+    h = (h * 0x85EBCA77) & 0xFFFFFFFF
+    h ^= h >> 13
+    return h
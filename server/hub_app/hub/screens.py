@@ -1,9 +1,9 @@
 # hub/screens.py
-import random
 import pygame
 
 from .widgets import Button, InputBox, ListBox
 from .deck_store import DeckStore
+from .permutation import Permutation, new_seed
 from .game_engine import GameEngine
 
 WIDTH, HEIGHT = 1000, 650
@@ -18,14 +18,15 @@ class FlashcardQuestionCycler:
     Provides flashcard questions in random order and cycles when exhausted.
     """
     def __init__(self, cards):
-        self.cards = cards[:] if cards else []
+        # deck snapshots are immutable and shared: no copy
+        self.cards = cards if cards is not None else []
         self.order = []
         self.pos = 0
         self._reshuffle()
 
     def _reshuffle(self):
-        self.order = list(range(len(self.cards)))
-        random.shuffle(self.order)
+        # computed per position: no list of len(cards) indices
+        self.order = Permutation(new_seed(), len(self.cards))
         self.pos = 0
 
     def next(self):
@@ -124,6 +125,7 @@ class ViewDecksScreen(ScreenBase):
     def __init__(self, app):
         super().__init__(app)
         self.list_box = ListBox(40, 150, 920, 280)
+        self._list_version = None   # store version the list was built for
         self.refresh_list()
 
         self.btn_set_default = Button(40, 450, 250, 50, "Set Default for Card Game")
@@ -133,13 +135,18 @@ class ViewDecksScreen(ScreenBase):
         self.message = ""
 
     def refresh_list(self):
+        # Only rebuild the lines when a deck changed since last time
+        version = self.app.store.get_store_version()
+        if version == self._list_version:
+            return
+        self._list_version = version
+
         items = []
         items.append("[CARD GAME] Mana Boss Deck (40 cards)")
 
-        default_id = self.app.store.get_default_flash_deck_id()
-        for deck_id, name, count in self.app.store.list_flash_decks():
-            mark = " (DEFAULT)" if deck_id == default_id else ""
-            items.append(f"[FLASH] {name} - {count} cards - id={deck_id}{mark}")
+        for d in self.app.store.menu_decks()["flash_decks"]:
+            mark = " (DEFAULT)" if d["is_default"] else ""
+            items.append(f"[FLASH] {d['name']} - {d['count']} cards - id={d['id']}{mark}")
 
         self.list_box.set_items(items)
 
@@ -376,8 +383,7 @@ class FlashcardsStudyScreen(ScreenBase):
             self.message = "This deck has no cards."
             return
         self.mode = "quiz"
-        self.q_order = list(range(len(self.cards)))
-        random.shuffle(self.q_order)
+        self.q_order = Permutation(new_seed(), len(self.cards))
         self.q_pos = 0
         self.score = 0
         self.answer.text = ""
@@ -684,7 +690,7 @@ class CardGameScreen(ScreenBase):
         x0, y0 = 40, 430
         w, h = 180, 90
         gap = 12
-        hand = self.session.engine.player.hand
+        hand = self.session.engine.hand_cards()
 
         for i, card in enumerate(hand):
             r = pygame.Rect(x0 + i * (w + gap), y0, w, h)
@@ -699,6 +705,6 @@ class CardGameScreen(ScreenBase):
         pygame.draw.rect(screen, (255, 255, 255), box, border_radius=10)
         pygame.draw.rect(screen, (30, 30, 30), box, 2, border_radius=10)
         y = box.y + 8
-        for line in self.session.engine.log_lines[-4:]:
+        for line in self.session.engine.log.lines(4):
             screen.blit(font.render(line, True, (25, 25, 25)), (box.x + 10, y))
             y += 20
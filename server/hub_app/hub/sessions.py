@@ -0,0 +1,513 @@
+# hub/sessions.py
+# Session storage for the API server (engine.py).
+#
+# SessionTable (default) keeps games in this process's memory.
+# SqliteSessionStore keeps them in a shared SQLite file (WAL mode), so
+# several uvicorn workers can serve the same games.
+#
+# Both have the same surface: get / put / pop / sweep / transaction.
+#
+# SessionTable:
+# - Tracks when each game was last used.
+# - Drops games that sit idle for too long.
+# - Keeps at most max_sessions games; when full it evicts the least
+#   recently used game (if that game is idle enough) or refuses new games.
+# - Optionally "hibernates" idle games: they are written to a spill
+#   directory and dropped from RAM, then loaded back on the next get()
+#   (or ahead of it with load(), which the async API runs in a thread).
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class SessionTableFull(Exception):
+    """Raised by SessionTable.put() when no more games can be admitted."""
+    pass
+
+
+class SessionTable:
+    """
+    game_id -> session dict, with last-access tracking.
+
+    - get() marks a session as recently used.
+    - Sessions idle longer than idle_ttl seconds expire.
+    - When max_sessions is reached, the least recently used session is
+      evicted, but only if it has been idle for at least evict_after
+      seconds. Otherwise put() raises SessionTableFull so the API can
+      answer 503 instead of throwing away a game someone is playing.
+    - If spill_dir is set, sweep() writes sessions idle longer than
+      hibernate_after seconds to disk (pack(session) -> bytes) and keeps
+      only a placeholder in memory. get() loads them back with unpack().
+    - on_drop(game_id, reason) is called when the table itself drops a game
+      (reason "expired" or "evicted"; not for pop()). It runs with the
+      table lock held, so it must be quick and not use the table.
+    """
+
+    def __init__(self, max_sessions=10000, idle_ttl=3600, evict_after=300,
+                 spill_dir=None, hibernate_after=120, pack=None, unpack=None,
+                 clock=time.monotonic, on_drop=None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.evict_after = evict_after
+        self.spill_dir = spill_dir
+        self.hibernate_after = hibernate_after
+        self._pack = pack or _default_pack
+        self._unpack = unpack or _default_unpack
+        self._clock = clock
+        self._on_drop = on_drop
+
+        # FastAPI runs sync handlers on a threadpool
+        self._lock = threading.Lock()
+
+        # game_id -> [session, last_access]
+        # Ordered from least recently used to most recently used.
+        # session is None while the game is hibernated on disk.
+        self._items = OrderedDict()
+
+        # Same order, but only the sessions that are in RAM.
+        self._resident = OrderedDict()
+
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._load_spilled()
+
+    def __len__(self):
+        return len(self._items)
+
+    def resident_count(self):
+        return len(self._resident)
+
+    def __contains__(self, game_id):
+        return self.get(game_id) is not None
+
+    # --------- Lookups ---------
+
+    def has(self, game_id):
+        """
+        True if the game is known and not expired, in RAM or hibernated.
+        Unlike `in`, it doesn't load a hibernated session or mark it as used.
+        """
+        with self._lock:
+            entry = self._items.get(game_id)
+            return entry is not None and self._clock() - entry[1] < self.idle_ttl
+
+    def hibernated(self, game_id):
+        # True if the game is on disk, waiting for load() / get()
+        with self._lock:
+            entry = self._items.get(game_id)
+            return entry is not None and entry[0] is None
+
+    def load(self, game_id):
+        """
+        Brings a hibernated session back into RAM (and marks it as used), so
+        the next get() is a plain lookup. The spill file is read and unpacked
+        without holding the table lock. Does nothing for other games.
+        """
+        if not self.hibernated(game_id):
+            return
+        try:
+            with open(self._spill_path(game_id), "rb") as f:
+                session = self._unpack(f.read())
+        except Exception:
+            session = None
+        with self._lock:
+            entry = self._items.get(game_id)
+            if entry is None or entry[0] is not None:
+                return   # ended, or loaded by someone else meanwhile
+            if session is None:
+                self._drop(game_id)   # spill file lost or unreadable
+                return
+            entry[0] = session
+            entry[1] = self._clock()
+            self._items.move_to_end(game_id)
+            self._resident[game_id] = None
+            self._resident.move_to_end(game_id)
+            self._remove_spill_file(game_id)
+
+    def get(self, game_id):
+        """
+        Returns the session (and marks it as used), or None if unknown/expired.
+        A hibernated session is loaded here if load() wasn't called first.
+        """
+        with self._lock:
+            now = self._clock()
+            self._purge_expired(now)
+            entry = self._items.get(game_id)
+            if entry is None:
+                return None
+            if entry[0] is None:
+                entry[0] = self._rehydrate(game_id)
+                if entry[0] is None:
+                    # spill file lost or unreadable
+                    del self._items[game_id]
+                    return None
+            entry[1] = now
+            self._items.move_to_end(game_id)
+            self._resident[game_id] = None
+            self._resident.move_to_end(game_id)
+            return entry[0]
+
+    @contextmanager
+    def transaction(self, game_id):
+        """
+        with table.transaction(game_id) as s: ...mutate s...
+        s is None if the game is unknown. Sessions live in RAM, so there
+        is nothing to save afterwards.
+        """
+        yield self.get(game_id)
+
+    # --------- Mutations ---------
+
+    def put(self, game_id, session):
+        with self._lock:
+            now = self._clock()
+            self._purge_expired(now)
+
+            if game_id not in self._items and len(self._items) >= self.max_sessions:
+                self._evict_lru(now)
+
+            if self._items.get(game_id, [True])[0] is None:
+                self._remove_spill_file(game_id)
+            self._items[game_id] = [session, now]
+            self._items.move_to_end(game_id)
+            self._resident[game_id] = None
+            self._resident.move_to_end(game_id)
+
+    def pop(self, game_id):
+        """
+        Removes a session right away. Returns it, or None if it was unknown.
+        """
+        with self._lock:
+            entry = self._items.get(game_id)
+            if entry is None:
+                return None
+            if entry[0] is None:
+                entry[0] = self._rehydrate(game_id)
+            self._drop(game_id)
+            return entry[0]
+
+    def sweep(self):
+        """
+        Drops every expired session, then hibernates idle ones (if enabled).
+        Returns how many sessions were expired.
+        """
+        with self._lock:
+            removed = self._purge_expired(self._clock())
+        self.hibernate_idle()
+        return removed
+
+    # --------- Hibernation ---------
+
+    def hibernate_idle(self):
+        """
+        Writes sessions idle longer than hibernate_after to spill_dir and
+        drops them from RAM. Returns how many were hibernated.
+        """
+        if not self.spill_dir or self.hibernate_after is None:
+            return 0
+
+        # Pick candidates under the lock, but do the disk writes without it.
+        with self._lock:
+            now = self._clock()
+            candidates = []
+            for game_id in self._resident:
+                session, last = self._items[game_id]
+                if now - last < self.hibernate_after:
+                    break
+                candidates.append((game_id, session, last))
+
+        count = 0
+        for game_id, session, last in candidates:
+            try:
+                data = self._pack(session)
+                tmp = self._spill_path(game_id) + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, self._spill_path(game_id))
+            except Exception:
+                continue
+
+            with self._lock:
+                entry = self._items.get(game_id)
+                if entry is not None and entry[0] is session and entry[1] == last:
+                    entry[0] = None
+                    self._resident.pop(game_id, None)
+                    count += 1
+                elif entry is None or entry[0] is not None:
+                    # Used (or ended) while we were writing: keep it in RAM.
+                    self._remove_spill_file(game_id)
+        return count
+
+    def _spill_path(self, game_id):
+        return os.path.join(self.spill_dir, game_id + ".bin")
+
+    def _rehydrate(self, game_id):
+        path = self._spill_path(game_id)
+        try:
+            with open(path, "rb") as f:
+                session = self._unpack(f.read())
+        except Exception:
+            session = None
+        self._remove_spill_file(game_id)
+        return session
+
+    def _remove_spill_file(self, game_id):
+        try:
+            os.remove(self._spill_path(game_id))
+        except OSError:
+            pass
+
+    def _load_spilled(self):
+        # Games hibernated by a previous run survive a restart.
+        # We don't know their real idle time, so treat them as just used.
+        now = self._clock()
+        names = [n for n in os.listdir(self.spill_dir) if n.endswith(".bin")]
+        names.sort(key=lambda n: os.path.getmtime(os.path.join(self.spill_dir, n)))
+        for name in names:
+            self._items[name[:-len(".bin")]] = [None, now]
+
+    # --------- Internals (call with the lock held) ---------
+
+    def _purge_expired(self, now):
+        # Oldest entries are at the front, so stop at the first fresh one.
+        removed = 0
+        while self._items:
+            game_id, entry = next(iter(self._items.items()))
+            if now - entry[1] < self.idle_ttl:
+                break
+            self._drop(game_id)
+            self._dropped(game_id, "expired")
+            removed += 1
+        return removed
+
+    def _evict_lru(self, now):
+        game_id, entry = next(iter(self._items.items()))
+        if now - entry[1] < self.evict_after:
+            raise SessionTableFull("Too many active games.")
+        self._drop(game_id)
+        self._dropped(game_id, "evicted")
+
+    def _dropped(self, game_id, reason):
+        if self._on_drop is not None:
+            self._on_drop(game_id, reason)
+
+    def _drop(self, game_id):
+        entry = self._items.pop(game_id)
+        self._resident.pop(game_id, None)
+        if entry[0] is None:
+            self._remove_spill_file(game_id)
+
+
+class SqliteSessionStore:
+    """
+    Same surface as SessionTable, but sessions are stored in SQLite so
+    every worker process sees every game.
+
+    - Rows hold pack(session) bytes plus a wall-clock last_access.
+    - transaction() loads, yields, and saves the session inside one
+      BEGIN IMMEDIATE ... COMMIT, so concurrent workers can't interleave
+      updates to the same game.
+    - Expiry and the max_sessions cap work like SessionTable.
+    """
+
+    def __init__(self, path="game_sessions.db", max_sessions=10000, idle_ttl=3600,
+                 evict_after=300, pack=None, unpack=None, clock=time.time):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.evict_after = evict_after
+        # get() refreshes last_access at most this often (expiry and LRU
+        # eviction work in minutes, so seconds don't matter)
+        self.touch_after = min(10.0, idle_ttl / 10)
+        self._pack = pack or _default_pack
+        self._unpack = unpack or _default_unpack
+        self._clock = clock
+
+        # sqlite3 connections can't be shared between threads
+        self._local = threading.local()
+
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " game_id TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions(last_access)")
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # autocommit mode; transactions are opened explicitly
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def __len__(self):
+        row = self._db().execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return row[0]
+
+    def __contains__(self, game_id):
+        return self.get(game_id) is not None
+
+    # --------- Lookups ---------
+
+    def has(self, game_id):
+        # Same as SessionTable.has(): no unpacking, last_access untouched
+        row = self._db().execute(
+            "SELECT 1 FROM sessions WHERE game_id = ? AND last_access > ?",
+            (game_id, self._clock() - self.idle_ttl),
+        ).fetchone()
+        return row is not None
+
+    def get(self, game_id):
+        """
+        Returns a copy of the session (and marks it as used), or None.
+        Changes to the copy are not saved; use transaction() for that.
+        A plain read (no BEGIN IMMEDIATE), so it never waits for writers;
+        last_access is only written when it's touch_after seconds old.
+        """
+        db = self._db()
+        now = self._clock()
+        row = db.execute(
+            "SELECT data, last_access FROM sessions WHERE game_id = ? AND last_access > ?",
+            (game_id, now - self.idle_ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        if now - row[1] >= self.touch_after:
+            db.execute(
+                "UPDATE sessions SET last_access = ? WHERE game_id = ? AND last_access < ?",
+                (now, game_id, now),
+            )
+        return self._unpack(row[0])
+
+    def peek(self, game_id):
+        """
+        Like get(), but doesn't mark the game as used (for watchers such as
+        /game/stream, which shouldn't keep an abandoned game alive).
+        """
+        row = self._db().execute(
+            "SELECT data FROM sessions WHERE game_id = ? AND last_access > ?",
+            (game_id, self._clock() - self.idle_ttl),
+        ).fetchone()
+        return self._unpack(row[0]) if row else None
+
+    @contextmanager
+    def transaction(self, game_id, save=True):
+        """
+        with store.transaction(game_id) as s: ...mutate s...
+        s is None if the game is unknown. The session is written back when
+        the block finishes; an exception rolls everything back.
+        """
+        db = self._db()
+        now = self._clock()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT data FROM sessions WHERE game_id = ? AND last_access > ?",
+                (game_id, now - self.idle_ttl),
+            ).fetchone()
+            s = self._unpack(row[0]) if row else None
+
+            yield s
+
+            if s is not None:
+                if save:
+                    db.execute(
+                        "UPDATE sessions SET data = ?, last_access = ? WHERE game_id = ?",
+                        (self._pack(s), now, game_id),
+                    )
+                else:
+                    db.execute(
+                        "UPDATE sessions SET last_access = ? WHERE game_id = ?",
+                        (now, game_id),
+                    )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    # --------- Mutations ---------
+
+    def put(self, game_id, session):
+        db = self._db()
+        now = self._clock()
+        data = self._pack(session)
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            self._purge_expired(db, now)
+
+            exists = db.execute(
+                "SELECT 1 FROM sessions WHERE game_id = ?", (game_id,)
+            ).fetchone()
+            if not exists:
+                count = db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+                if count >= self.max_sessions:
+                    self._evict_lru(db, now)
+
+            db.execute(
+                "INSERT OR REPLACE INTO sessions (game_id, data, last_access) VALUES (?, ?, ?)",
+                (game_id, data, now),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def pop(self, game_id):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT data FROM sessions WHERE game_id = ?", (game_id,)
+            ).fetchone()
+            db.execute("DELETE FROM sessions WHERE game_id = ?", (game_id,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return self._unpack(row[0]) if row else None
+
+    def sweep(self):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            removed = self._purge_expired(db, self._clock())
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return removed
+
+    # --------- Internals (call inside a transaction) ---------
+
+    def _purge_expired(self, db, now):
+        cur = db.execute("DELETE FROM sessions WHERE last_access <= ?", (now - self.idle_ttl,))
+        return cur.rowcount
+
+    def _evict_lru(self, db, now):
+        row = db.execute(
+            "SELECT game_id, last_access FROM sessions ORDER BY last_access LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return
+        if now - row[1] < self.evict_after:
+            raise SessionTableFull("Too many active games.")
+        db.execute("DELETE FROM sessions WHERE game_id = ?", (row[0],))
+
+
+def _default_pack(session):
+    return zlib.compress(pickle.dumps(session, pickle.HIGHEST_PROTOCOL))
+
+
+def _default_unpack(data):
+    return pickle.loads(zlib.decompress(data))
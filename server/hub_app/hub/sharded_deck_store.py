@@ -0,0 +1,655 @@
+# hub/sharded_deck_store.py
+# DeckStore with one file per deck, read only when the deck is used.
+#
+#   decks/manifest.json           names, card counts, versions, default deck id,
+#                                 and the byte offset of every INDEX_STEP-th card
+#   decks/manifest.journal        changes since manifest.json was written, one
+#                                 JSON line each
+#   decks/cards/<deck>.ndjson     one {"front": ..., "back": ...} per line
+#
+# - Startup only reads the manifest: listings and menus never open card files.
+# - A deck's cards are read the first time someone asks for them and kept in
+#   an LRU of resident decks. Once their estimated size goes over
+#   memory_budget, the least recently used decks are dropped (games holding
+#   a DeckSnapshot of one keep it until they let go).
+# - Adding cards appends lines to that deck's file, then appends one line
+#   (new count, byte size and index entries of that deck) to the manifest
+#   journal, so a change costs the same however many decks there are. Once
+#   the journal passes journal_max_bytes, the manifest is rewritten (temp
+#   file + fsync + rename) and the journal emptied. The manifest remembers
+#   how many bytes of each card file are valid, so a line written just
+#   before a crash (with no journal line) is ignored and later cut off.
+# - Card pages of a deck that isn't resident seek straight to the nearest
+#   indexed card instead of reading the whole file.
+# - Several processes can share the directory: changes happen under an
+#   exclusive flock() on decks/manifest.lock, after reading what other
+#   processes added to the journal (or the new manifest, if one replaced
+#   it), and reads notice their changes within poll_interval seconds.
+#
+# One-shot import of an existing decks.json (+ journal):
+#   python -m hub_app.hub.sharded_deck_store decks.json decks
+
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .deck_store import DeckSnapshot, FlashCard, estimate_card_bytes, new_deck_id, read_decks
+from .rwlock import RWLock
+from .sample_flashcards import get_sample_flashcards_20
+from .store_common import CatalogueListing, FileLocking, catalogue_key, stat_sig
+
+INDEX_STEP = 256      # manifest keeps the file offset of cards 0, 256, 512, ...
+
+
+class ShardedDeckStore(FileLocking, CatalogueListing):
+    def __init__(self, root="decks", memory_budget=64 * 1024 * 1024, import_from=None,
+                 poll_interval=1.0, journal_max_bytes=1_000_000):
+        """
+        memory_budget: bytes of resident cards to keep (roughly); the most
+        recently used deck always stays, even if it alone is bigger.
+        import_from: a decks.json to copy in if this directory has no decks yet.
+        poll_interval: seconds between checks for changes written by
+        another process.
+        journal_max_bytes: manifest journal size that triggers a manifest rewrite.
+        """
+        self.root = root
+        self.cards_dir = os.path.join(root, "cards")
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self.journal_path = os.path.join(root, "manifest.journal")
+        self.lock_path = os.path.join(root, "manifest.lock")
+        self.memory_budget = memory_budget
+        self.poll_interval = poll_interval
+        self.journal_max_bytes = journal_max_bytes
+
+        self._rw = RWLock()     # guards _decks, _default_id, _catalogue, _version, and the files
+        self._decks = {}        # deck_id -> {"name", "count", "bytes", "version", "file", "index"}
+        self._default_id = "sample"
+        self._catalogue = []    # sorted catalogue_key()s of every deck
+        self._version = 0       # store version (bumped on every change)
+        self._listing = None    # (version, list_flash_decks() result)
+        self._menu = None       # (version, menu_decks() result)
+
+        self._cache_lock = threading.Lock()   # guards the three below
+        self._resident = OrderedDict()        # deck_id -> [cards, estimated bytes], oldest use first
+        self._resident_bytes = 0
+        self._snapshots = {}                  # deck_id -> DeckSnapshot of the current version
+
+        self._io_lock = threading.Lock()   # one user of the lock file / journal at a time
+        self._lock_file = None
+        self._manifest_sig = None          # os.stat() signature of the manifest we last read / wrote
+        self._journal_pos = 0              # journal bytes read (or written) so far
+        self._seq = 0                      # "n" of the last journal line read or written
+        self._last_check = 0.0             # time.monotonic() of the last refresh()
+
+        os.makedirs(self.cards_dir, exist_ok=True)
+        with self._io_lock, self._file_lock(exclusive=False):
+            self._catch_up()
+        if import_from and not self._decks and os.path.exists(import_from):
+            self.import_json(import_from)
+        self.ensure_sample_deck()
+
+    # --------- Manifest + journal ---------
+    # Journal lines ("n" counts up; the manifest's journal_seq is the last
+    # one it already includes, so lines left over from a crash during a
+    # rewrite are skipped):
+    #   {"n": 7, "op": "set", "id": deck_id, "meta": {...}}     new / replaced / renamed deck
+    #   {"n": 8, "op": "add", "id": deck_id, "count": 12, "bytes": 480,
+    #    "version": 3, "index": [offsets of new INDEX_STEP-th cards] or null}
+    #   {"n": 9, "op": "default", "id": deck_id, "version": 4}
+
+    def _log(self, op, deck_id, **fields):
+        # Call from _writing(), after changing the deck in memory
+        self._seq += 1
+        rec = {"n": self._seq, "op": op, "id": deck_id}
+        rec.update(fields)
+        line = (json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with open(self.journal_path, "ab") as f:
+            # _catch_up() just read the journal under the file lock, so
+            # anything past _journal_pos is a torn line from before a crash
+            if f.tell() != self._journal_pos:
+                f.truncate(self._journal_pos)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_pos += len(line)
+        if self._journal_pos > self.journal_max_bytes:
+            self._write_manifest()
+
+    def _log_deck(self, deck_id):
+        self._log("set", deck_id, meta=self._decks[deck_id])
+
+    def _write_manifest(self):
+        # Call from _writing(). Everything goes into a new manifest; then
+        # the journal can be emptied.
+        data = {"default_flash_deck_id": self._default_id, "decks": self._decks, "journal_seq": self._seq}
+        _replace_file(self.manifest_path, json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self._manifest_sig = stat_sig(self.manifest_path)
+        with open(self.journal_path, "wb") as f:
+            os.fsync(f.fileno())
+        self._journal_pos = 0
+
+    def _changed(self, deck_id):
+        # Call from _writing(), before writing the manifest
+        self._decks[deck_id]["version"] += 1
+        self._version += 1
+        with self._cache_lock:
+            self._snapshots.pop(deck_id, None)
+
+    def _card_path(self, meta):
+        return os.path.join(self.cards_dir, meta["file"])
+
+    # --------- Card files + resident decks ---------
+
+    def _load_cards(self, meta):
+        # The first meta["count"] cards (the valid part of the file)
+        cards = []
+        try:
+            with open(self._card_path(meta), "rb") as f:
+                raw = f.read(meta["bytes"])
+        except OSError:
+            return cards
+        for line in raw.splitlines():
+            try:
+                c = json.loads(line)
+                cards.append(FlashCard(str(c["front"]), str(c["back"])))
+            except:
+                continue
+        return cards[:meta["count"]]
+
+    def _resident_cards(self, deck_id, meta):
+        # Call with _cache_lock held
+        entry = self._resident.get(deck_id)
+        if entry is not None:
+            self._resident.move_to_end(deck_id)
+            return entry[0]
+        cards = self._load_cards(meta)
+        size = estimate_card_bytes(cards)
+        self._resident[deck_id] = [cards, size]
+        self._resident_bytes += size
+        self._evict()
+        return cards
+
+    def _evict(self):
+        # Call with _cache_lock held
+        while self._resident_bytes > self.memory_budget and len(self._resident) > 1:
+            deck_id, (_, size) = self._resident.popitem(last=False)
+            self._resident_bytes -= size
+            self._snapshots.pop(deck_id, None)
+
+    def _append_cards(self, deck_id, cards):
+        # Call from _writing(). cards: list of FlashCard
+        meta = self._decks[deck_id]
+        lines = [_card_line(c) for c in cards]
+        data = b"".join(lines)
+        with open(self._card_path(meta), "r+b") as f:
+            # The manifest was just re-read under the file lock, so anything
+            # past meta["bytes"] is a torn tail from before a crash
+            f.seek(0, os.SEEK_END)
+            start = min(f.tell(), meta["bytes"])
+            f.seek(start)
+            f.truncate()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        new_index = None
+        if start == meta["bytes"] and "index" in meta:
+            new_index = []
+            _extend_index(new_index, meta["count"], start, lines)
+            meta["index"].extend(new_index)
+        else:
+            meta.pop("index", None)   # the file lost cards: pages read the whole deck
+        meta["bytes"] = start + len(data)
+        meta["count"] += len(cards)
+
+        with self._cache_lock:
+            entry = self._resident.get(deck_id)
+            if entry is not None:
+                entry[0].extend(cards)
+                size = estimate_card_bytes(cards)
+                entry[1] += size
+                self._resident_bytes += size
+                self._evict()
+        self._changed(deck_id)
+        self._log("add", deck_id, count=meta["count"], bytes=meta["bytes"],
+                  version=meta["version"], index=new_index)
+
+    def _insert_deck(self, deck_id, name, cards):
+        # Call from _writing(). Writes a whole deck (new or replaced); the
+        # caller logs it (or writes the manifest) after.
+        cards = [FlashCard(str(c["front"]), str(c["back"])) for c in cards]
+        if deck_id in self._decks:
+            self._uncatalogue(deck_id)
+            version = self._decks[deck_id]["version"]
+        else:
+            version = 0
+        meta = {"name": str(name), "count": len(cards), "bytes": 0, "version": version,
+                "file": _file_name(deck_id), "index": []}
+        lines = [_card_line(c) for c in cards]
+        _extend_index(meta["index"], 0, 0, lines)
+        data = b"".join(lines)
+        _replace_file(self._card_path(meta), data)
+        meta["bytes"] = len(data)
+
+        self._decks[deck_id] = meta
+        insort(self._catalogue, catalogue_key(deck_id, meta["name"]))
+        with self._cache_lock:
+            entry = self._resident.pop(deck_id, None)
+            if entry is not None:
+                self._resident_bytes -= entry[1]
+        self._changed(deck_id)
+
+    def _uncatalogue(self, deck_id):
+        key = catalogue_key(deck_id, self._decks[deck_id]["name"])
+        i = bisect_left(self._catalogue, key)
+        if i < len(self._catalogue) and self._catalogue[i] == key:
+            del self._catalogue[i]
+
+    # --------- Other processes ---------
+
+    @contextmanager
+    def _writing(self):
+        # Every change: files locked against other processes, their changes
+        # read in first, then the write lock
+        with self._io_lock, self._file_lock():
+            self._catch_up()
+            with self._rw.write():
+                yield
+
+    def refresh(self):
+        """
+        Picks up changes another process wrote. Reads call this at most
+        every poll_interval seconds; it's two os.stat() calls when nothing
+        changed.
+        """
+        with self._io_lock:
+            self._last_check = time.monotonic()
+            if self._files_changed():
+                with self._file_lock(exclusive=False):
+                    self._catch_up()
+
+    def _maybe_refresh(self, deck_id=None):
+        # Also refreshes right away for a deck we don't know, which another
+        # process may have just created
+        if time.monotonic() - self._last_check >= self.poll_interval:
+            self.refresh()
+        elif deck_id is not None and deck_id not in self._decks:
+            self.refresh()
+
+    def _files_changed(self):
+        if stat_sig(self.manifest_path) != self._manifest_sig:
+            return True
+        try:
+            return os.path.getsize(self.journal_path) != self._journal_pos
+        except OSError:
+            return self._journal_pos != 0
+
+    def _catch_up(self):
+        # Call with _io_lock and the file lock held
+        sig = stat_sig(self.manifest_path)
+        if sig != self._manifest_sig:
+            self._reload(sig)
+            return
+        lines, end = self._journal_tail(self._journal_pos)
+        if lines:
+            with self._rw.write():
+                changed = set()
+                for rec in lines:
+                    changed.update(self._apply(self._decks, rec))
+                self._forget(changed)
+                if changed:
+                    self._version += 1
+                    self._catalogue = sorted(catalogue_key(deck_id, m["name"]) for deck_id, m in self._decks.items())
+        self._journal_pos = end
+
+    def _reload(self, sig):
+        # A new manifest (another process rewrote it): read it and its journal
+        data = {}
+        if sig is not None:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        decks = data.get("decks", {})
+        lines, end = self._journal_tail(0)
+        with self._rw.write():
+            old_decks, old_default = self._decks, self._default_id
+            self._decks = decks
+            self._default_id = data.get("default_flash_deck_id", "sample")
+            self._seq = data.get("journal_seq", 0)
+            for rec in lines:
+                self._apply(decks, rec)
+            # Decks whose entry changed are dropped from memory (games keep
+            # their snapshots) and read again when they're next used
+            changed = {deck_id for deck_id in set(old_decks) | set(decks)
+                       if old_decks.get(deck_id) != decks.get(deck_id)}
+            self._forget(changed)
+            if changed or old_default != self._default_id:
+                self._version += 1
+                self._catalogue = sorted(catalogue_key(deck_id, m["name"]) for deck_id, m in decks.items())
+        self._manifest_sig = sig
+        self._journal_pos = end
+
+    def _journal_tail(self, pos):
+        # Complete journal lines from byte pos on, and where they end
+        try:
+            with open(self.journal_path, "rb") as f:
+                f.seek(pos)
+                raw = f.read()
+        except OSError:
+            return [], 0
+        lines = []
+        for line in raw.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break   # torn last line (a crash mid-write): not ours to read yet
+            pos += len(line)
+            try:
+                lines.append(json.loads(line))
+            except:
+                continue
+        return lines, pos
+
+    def _apply(self, decks, rec):
+        # One journal line -> decks (and _default_id / _seq); returns the
+        # ids of the decks it changed. Call with the write lock held.
+        n = rec.get("n", 0)
+        if n <= self._seq:
+            return ()   # already in the manifest
+        self._seq = n
+        deck_id = rec.get("id")
+        op = rec.get("op")
+        if op == "set":
+            decks[deck_id] = rec["meta"]
+        elif op == "add" and deck_id in decks:
+            meta = decks[deck_id]
+            meta["count"] = rec["count"]
+            meta["bytes"] = rec["bytes"]
+            meta["version"] = rec["version"]
+            if rec.get("index") is None:
+                meta.pop("index", None)
+            elif "index" in meta:
+                meta["index"].extend(rec["index"])
+        elif op == "default":
+            self._default_id = deck_id
+            if deck_id in decks:
+                decks[deck_id]["version"] = rec["version"]
+        else:
+            return ()
+        return (deck_id,)
+
+    def _forget(self, deck_ids):
+        # Call with the write lock held
+        with self._cache_lock:
+            for deck_id in deck_ids:
+                self._snapshots.pop(deck_id, None)
+                entry = self._resident.pop(deck_id, None)
+                if entry is not None:
+                    self._resident_bytes -= entry[1]
+
+    # --------- Same surface as DeckStore ---------
+
+    def ensure_sample_deck(self):
+        with self._writing():
+            if "sample" not in self._decks:
+                self._insert_deck("sample", "Sample Deck (20)", get_sample_flashcards_20())
+                self._default_id = "sample"
+                self._log_deck("sample")
+                self._log("default", "sample", version=self._decks["sample"]["version"])
+
+    def get_store_version(self):
+        self._maybe_refresh()
+        with self._rw.read():
+            return self._version
+
+    # list_flash_decks(), list_flash_decks_page(), menu_decks(): CatalogueListing
+
+    def _before_read(self):
+        self._maybe_refresh()
+
+    def _deck_row(self, deck_id):
+        meta = self._decks[deck_id]
+        return meta["name"], meta["count"]
+
+    def _default_id_locked(self):
+        if self._default_id not in self._decks:
+            return "sample"
+        return self._default_id
+
+    def get_default_flash_deck_id(self):
+        self._maybe_refresh()
+        with self._rw.read():
+            return self._default_id_locked()
+
+    def set_default_flash_deck(self, deck_id):
+        with self._writing():
+            if deck_id not in self._decks:
+                return False
+            self._default_id = deck_id
+            self._changed(deck_id)
+            self._log("default", deck_id, version=self._decks[deck_id]["version"])
+        return True
+
+    def get_deck(self, deck_id):
+        # {"name": ..., "count": ...} or None (cards: see get_deck_cards)
+        self._maybe_refresh(deck_id)
+        with self._rw.read():
+            meta = self._decks.get(deck_id)
+            if meta is None:
+                return None
+            return {"name": meta["name"], "count": meta["count"]}
+
+    def get_deck_version(self, deck_id):
+        self._maybe_refresh()
+        with self._rw.read():
+            meta = self._decks.get(deck_id)
+            return meta["version"] if meta else 0
+
+    def get_deck_cards(self, deck_id):
+        """
+        Returns the current DeckSnapshot of the deck (empty if unknown),
+        reading its file first if it isn't resident.
+        """
+        self._maybe_refresh(deck_id)
+        with self._rw.read():
+            meta = self._decks.get(deck_id)
+            if meta is None:
+                return DeckSnapshot(deck_id, 0, [], 0)
+            with self._cache_lock:
+                snap = self._snapshots.get(deck_id)
+                if snap is not None:
+                    self._resident.move_to_end(deck_id)
+                    return snap
+
+        # Read the file under the shared file lock, so no other process
+        # rewrites it (or the manifest) halfway through
+        with self._io_lock, self._file_lock(exclusive=False):
+            self._catch_up()
+            return self._deck_cards_locked(deck_id)
+
+    def _deck_cards_locked(self, deck_id):
+        with self._rw.read():
+            meta = self._decks.get(deck_id)
+            if meta is None:
+                return DeckSnapshot(deck_id, 0, [], 0)
+            with self._cache_lock:
+                snap = self._snapshots.get(deck_id)
+                if snap is not None:
+                    self._resident.move_to_end(deck_id)
+                    return snap
+                cards = self._resident_cards(deck_id, meta)
+                snap = DeckSnapshot(deck_id, meta["version"], cards, len(cards))
+                if deck_id in self._resident:
+                    self._snapshots[deck_id] = snap
+                return snap
+
+    def get_cards_page(self, deck_id, start, limit):
+        """
+        Same as DeckStore.get_cards_page(). A resident deck is sliced; for
+        any other, only the cards from the indexed one before start are
+        read, so it's O(INDEX_STEP + limit) and the deck stays unloaded.
+        """
+        self._maybe_refresh(deck_id)
+        with self._rw.read():
+            meta = self._decks.get(deck_id)
+            if meta is None:
+                return None
+            with self._cache_lock:
+                resident = deck_id in self._resident
+        if resident or "index" not in meta:
+            snap = self.get_deck_cards(deck_id)
+            return list(snap[start:start + limit]), len(snap)
+
+        with self._io_lock, self._file_lock(exclusive=False):
+            self._catch_up()
+            with self._rw.read():
+                meta = self._decks.get(deck_id)
+                if meta is None:
+                    return None
+                return self._read_page(meta, start, limit), meta["count"]
+
+    def _read_page(self, meta, start, limit):
+        # Call with the file lock held (and meta current)
+        count = min(limit, meta["count"] - start)
+        if count <= 0:
+            return []
+        block = start // INDEX_STEP
+        skip = start - block * INDEX_STEP
+        pos = meta["index"][block]
+        cards = []
+        with open(self._card_path(meta), "rb") as f:
+            f.seek(pos)
+            while len(cards) < count and pos < meta["bytes"]:
+                line = f.readline()
+                pos += len(line)
+                if not line.endswith(b"\n"):
+                    break
+                if skip:
+                    skip -= 1
+                    continue
+                try:
+                    c = json.loads(line)
+                    cards.append(FlashCard(str(c["front"]), str(c["back"])))
+                except:
+                    continue
+        return cards
+
+    def create_deck(self, name):
+        with self._writing():
+            deck_id = new_deck_id(lambda i: i in self._decks)
+            self._insert_deck(deck_id, name, [])
+            self._log_deck(deck_id)
+        return deck_id
+
+    def rename_deck(self, deck_id, name):
+        with self._writing():
+            if deck_id not in self._decks:
+                return False
+            self._uncatalogue(deck_id)
+            self._decks[deck_id]["name"] = str(name)
+            insort(self._catalogue, catalogue_key(deck_id, str(name)))
+            self._changed(deck_id)
+            self._log_deck(deck_id)
+        return True
+
+    def add_card(self, deck_id, front, back):
+        return self.add_cards(deck_id, [(front, back)])
+
+    def add_cards(self, deck_id, cards):
+        """
+        Appends many (front, back) cards with one file append and one
+        journal line. Returns False if the deck doesn't exist.
+        """
+        cards = [FlashCard(str(front), str(back)) for front, back in cards]
+        with self._writing():
+            if deck_id not in self._decks:
+                return False
+            if cards:
+                self._append_cards(deck_id, cards)
+        return True
+
+    # Writes are already on disk when a change returns; save() folds the
+    # journal into a new manifest
+    def save(self):
+        with self._writing():
+            self._write_manifest()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self._io_lock:
+            self._close_lock_file()
+
+    # --------- Import ---------
+
+    def import_json(self, json_path):
+        """
+        Copies every deck of a decks.json (journal included) into this
+        directory. Decks with the same id are replaced. The source is only
+        read (see read_decks()).
+        """
+        decks, default_id = read_decks(json_path)
+        with self._writing():
+            for deck_id, name, cards in decks:
+                self._insert_deck(deck_id, name, cards)
+            self._default_id = default_id
+            self._write_manifest()
+
+
+def _card_line(card):
+    line = json.dumps({"front": card.front, "back": card.back}, ensure_ascii=False)
+    return (line + "\n").encode("utf-8")
+
+
+def _extend_index(index, count, pos, lines):
+    # Offsets of the new INDEX_STEP-th cards among lines, which start at
+    # card number count / file offset pos
+    for line in lines:
+        if count % INDEX_STEP == 0:
+            index.append(pos)
+        count += 1
+        pos += len(line)
+
+
+def _replace_file(path, data):
+    # Atomic rewrite through a temp file of our own next to path, so
+    # processes writing the same file at once can't mix up their temp files
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _file_name(deck_id):
+    # Deck ids we make ("deck_<ms>_<hex>", "sample") are safe file names; others are hashed
+    if re.fullmatch(r"[A-Za-z0-9_-]{1,64}", deck_id):
+        return deck_id + ".ndjson"
+    return hashlib.sha1(deck_id.encode("utf-8")).hexdigest() + ".ndjson"
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("usage: python -m hub_app.hub.sharded_deck_store decks.json decks")
+        sys.exit(2)
+    store = ShardedDeckStore(sys.argv[2])
+    store.import_json(sys.argv[1])
+    print(f"Imported {len(store.list_flash_decks())} decks into {sys.argv[2]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+# hub/sqlite_deck_store.py
+# DeckStore with the same methods, kept in SQLite instead of one big JSON
+# document. Good for many / large decks and for several server workers
+# sharing one database file.
+#
+# - decks: one row per deck, with its card_count kept up to date (no scans)
+#   and its name_key (catalogue_name(), so decks sort exactly like DeckStore's).
+# - cards: (deck_id, pos) primary key, so a deck's cards are one index range.
+# - WAL mode: readers don't block each other or the writer.
+# - Cards read for games are cached in an LRU: once their estimated size goes
+#   over memory_budget, the least recently used decks are dropped (games
+#   holding a DeckSnapshot of one keep it until they let go). Card pages and
+#   exports read the database directly and never fill the cache.
+# - meta "store_version" is bumped by every change (from any process), so the
+#   deck listing / menu is only queried again when something changed.
+#
+# One-shot import of an existing decks.json (+ journal):
+#   python -m hub_app.hub.sqlite_deck_store decks.json decks.db
+
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+
+from .deck_store import (
+    DeckSnapshot, FlashCard, catalogue_name, estimate_card_bytes, menu_payload, new_deck_id, read_decks,
+)
+from .sample_flashcards import get_sample_flashcards_20
+
+
+class SqliteDeckStore:
+    def __init__(self, path="decks.db", memory_budget=64 * 1024 * 1024, import_from=None):
+        """
+        memory_budget: bytes of cached cards to keep (roughly); the most
+        recently used deck always stays, however big.
+        import_from: a decks.json to copy in if this database has no decks yet.
+        """
+        self.path = path
+        self.memory_budget = memory_budget
+        self._local = threading.local()
+        self._lock = threading.Lock()   # guards the card cache and snapshots
+        self._cards = OrderedDict()   # deck_id -> [cards loaded so far, estimated bytes], oldest use first
+        self._cards_bytes = 0
+        self._snapshots = {}   # deck_id -> DeckSnapshot of the newest version seen
+        self._listing = None   # (store version, list_flash_decks() result)
+        self._menu = None      # (store version, menu_decks() result)
+
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS decks ("
+            " deck_id TEXT PRIMARY KEY,"
+            " name TEXT NOT NULL,"
+            " card_count INTEGER NOT NULL DEFAULT 0,"
+            " version INTEGER NOT NULL DEFAULT 0,"
+            " name_key TEXT NOT NULL DEFAULT '')"
+        )
+        self._add_name_keys(db)
+        # menu order after "sample", for listing and paging the decks by key
+        db.execute("CREATE INDEX IF NOT EXISTS decks_key_id ON decks(name_key, deck_id)")
+        # (older databases sorted by name COLLATE NOCASE, which only folds
+        # ASCII, so non-ASCII names came out in a different order)
+        db.execute("DROP INDEX IF EXISTS decks_name_id")
+        db.execute("DROP INDEX IF EXISTS decks_name")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS cards ("
+            " deck_id TEXT NOT NULL,"
+            " pos INTEGER NOT NULL,"
+            " front TEXT NOT NULL,"
+            " back TEXT NOT NULL,"
+            " PRIMARY KEY (deck_id, pos)) WITHOUT ROWID"
+        )
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        if import_from and self._deck_count() == 0 and os.path.exists(import_from):
+            self.import_json(import_from)
+        self.ensure_sample_deck()
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # autocommit mode; transactions are opened explicitly
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _add_name_keys(self, db):
+        # Databases from before name_key: add the column and fill it in
+        # (in Python: SQLite's lower() doesn't fold non-ASCII letters)
+        columns = [row[1] for row in db.execute("PRAGMA table_info(decks)")]
+        if "name_key" in columns:
+            return
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            columns = [row[1] for row in db.execute("PRAGMA table_info(decks)")]
+            if "name_key" not in columns:
+                db.execute("ALTER TABLE decks ADD COLUMN name_key TEXT NOT NULL DEFAULT ''")
+                rows = db.execute("SELECT deck_id, name FROM decks").fetchall()
+                db.executemany(
+                    "UPDATE decks SET name_key = ? WHERE deck_id = ?",
+                    ((catalogue_name(name), deck_id) for deck_id, name in rows),
+                )
+            db.execute("COMMIT")
+        except:
+            db.execute("ROLLBACK")
+            raise
+
+    def _deck_count(self):
+        return self._db().execute("SELECT COUNT(*) FROM decks").fetchone()[0]
+
+    def _bump_version(self, db):
+        # Call inside the write transaction of a change
+        db.execute(
+            "INSERT INTO meta (key, value) VALUES ('store_version', 1)"
+            " ON CONFLICT(key) DO UPDATE SET value = value + 1"
+        )
+
+    def _store_version(self, db):
+        row = db.execute("SELECT value FROM meta WHERE key = 'store_version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def close(self):
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    # --------- Same surface as DeckStore ---------
+
+    def ensure_sample_deck(self):
+        if self.get_deck("sample") is None:
+            self._insert_deck("sample", "Sample Deck (20)", get_sample_flashcards_20())
+            self.set_default_flash_deck("sample")
+
+    def get_store_version(self):
+        return self._store_version(self._db())
+
+    def list_flash_decks(self):
+        """
+        Returns a list of (deck_id, name, count): sample first, then by name.
+        Shared until the next change: don't modify it.
+        """
+        return self._listing_at_version()[1]
+
+    def list_flash_decks_page(self, after=None, limit=50):
+        """
+        Same as DeckStore.list_flash_decks_page(). Seeks into the
+        decks_key_id index, so a page reads about `limit` rows.
+        """
+        db = self._db()
+        db.execute("BEGIN")
+        try:
+            rows = []
+            if after is None:
+                # "sample" always comes first
+                rows = db.execute(
+                    "SELECT deck_id, name, card_count FROM decks WHERE deck_id = 'sample'"
+                ).fetchall()[:limit]
+            sql = "SELECT deck_id, name, card_count FROM decks WHERE deck_id != 'sample'"
+            args = ()
+            if after is not None and after[0] != "sample":
+                after_id, after_name = after
+                # first term: index seek; second: skip same-name decks already sent
+                after_key = catalogue_name(after_name)
+                sql += " AND name_key >= ? AND (name_key, deck_id) > (?, ?)"
+                args = (after_key, after_key, after_id)
+            sql += " ORDER BY name_key, deck_id LIMIT ?"
+            rows += db.execute(sql, args + (limit - len(rows),)).fetchall()
+        finally:
+            db.execute("COMMIT")
+        return [(deck_id, name, count) for deck_id, name, count in rows]
+
+    def menu_decks(self):
+        """
+        Same payload as DeckStore.menu_decks(), built once per store version.
+        Shared: don't modify it.
+        """
+        cached = self._menu
+        if cached is not None and cached[0] == self.get_store_version():
+            return cached[1]
+        db = self._db()
+        # one read transaction: listing, default and version all match
+        db.execute("BEGIN")
+        try:
+            version, decks = self._listing_at_version()
+            default_id = self.get_default_flash_deck_id()
+        finally:
+            db.execute("COMMIT")
+        payload = menu_payload(decks, default_id)
+        self._menu = (version, payload)
+        return payload
+
+    def _listing_at_version(self):
+        db = self._db()
+        version = self._store_version(db)
+        cached = self._listing
+        if cached is not None and cached[0] == version:
+            return cached
+        rows = db.execute(
+            "SELECT deck_id, name, card_count FROM decks"
+            " ORDER BY deck_id != 'sample', name_key, deck_id"
+        ).fetchall()
+        cached = (version, [(deck_id, name, count) for deck_id, name, count in rows])
+        self._listing = cached
+        return cached
+
+    def get_default_flash_deck_id(self):
+        row = self._db().execute(
+            "SELECT d.deck_id FROM meta m JOIN decks d ON d.deck_id = m.value"
+            " WHERE m.key = 'default_flash_deck_id'"
+        ).fetchone()
+        return row[0] if row else "sample"
+
+    def set_default_flash_deck(self, deck_id):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if db.execute("SELECT 1 FROM decks WHERE deck_id = ?", (deck_id,)).fetchone() is None:
+                db.execute("ROLLBACK")
+                return False
+            db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('default_flash_deck_id', ?)",
+                (deck_id,),
+            )
+            self._bump_version(db)
+            db.execute("COMMIT")
+        except:
+            db.execute("ROLLBACK")
+            raise
+        return True
+
+    def get_deck(self, deck_id):
+        # {"name": ..., "count": ...} or None (cards: see get_deck_cards)
+        row = self._db().execute(
+            "SELECT name, card_count FROM decks WHERE deck_id = ?", (deck_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"name": row[0], "count": row[1]}
+
+    def get_deck_version(self, deck_id):
+        row = self._db().execute("SELECT version FROM decks WHERE deck_id = ?", (deck_id,)).fetchone()
+        return row[0] if row else 0
+
+    def get_deck_cards(self, deck_id):
+        """
+        Returns a shared, read-only DeckSnapshot (like DeckStore).
+        Only cards added since the last call are read from the database.
+        """
+        row = self._db().execute(
+            "SELECT card_count, version FROM decks WHERE deck_id = ?", (deck_id,)
+        ).fetchone()
+        if row is None:
+            return DeckSnapshot(deck_id, 0, [], 0)
+        count, version = row
+
+        with self._lock:
+            entry = self._cards.get(deck_id)
+            if entry is None:
+                entry = self._cards[deck_id] = [[], 0]
+            else:
+                self._cards.move_to_end(deck_id)
+            snap = self._snapshots.get(deck_id)
+            if snap is not None and len(snap) == count:
+                return snap
+
+            cards = entry[0]
+            if len(cards) < count:
+                new_rows = self._db().execute(
+                    "SELECT front, back FROM cards WHERE deck_id = ? AND pos >= ? AND pos < ?"
+                    " ORDER BY pos",
+                    (deck_id, len(cards), count),
+                ).fetchall()
+                new_cards = [FlashCard(front, back) for front, back in new_rows]
+                cards.extend(new_cards)
+                size = estimate_card_bytes(new_cards)
+                entry[1] += size
+                self._cards_bytes += size
+
+            snap = DeckSnapshot(deck_id, version, cards, min(count, len(cards)))
+            self._snapshots[deck_id] = snap
+            self._evict()
+            return snap
+
+    def _evict(self):
+        # Call with _lock held
+        while self._cards_bytes > self.memory_budget and len(self._cards) > 1:
+            deck_id, (_, size) = self._cards.popitem(last=False)
+            self._cards_bytes -= size
+            self._snapshots.pop(deck_id, None)
+
+    def get_cards_page(self, deck_id, start, limit):
+        """
+        Cards start .. start+limit-1 and the card count (None: no such deck).
+        Reads just that range of the primary key, not the whole deck.
+        """
+        db = self._db()
+        db.execute("BEGIN")
+        try:
+            row = db.execute("SELECT card_count FROM decks WHERE deck_id = ?", (deck_id,)).fetchone()
+            if row is None:
+                return None
+            rows = db.execute(
+                "SELECT front, back FROM cards WHERE deck_id = ? AND pos >= ? AND pos < ?"
+                " ORDER BY pos",
+                (deck_id, start, min(start + limit, row[0])),
+            ).fetchall()
+        finally:
+            db.execute("COMMIT")
+        return [FlashCard(front, back) for front, back in rows], row[0]
+
+    def create_deck(self, name):
+        db = self._db()
+        # BEGIN IMMEDIATE: no other writer (thread or process) can pick the same id
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            deck_id = new_deck_id(
+                lambda i: db.execute("SELECT 1 FROM decks WHERE deck_id = ?", (i,)).fetchone() is not None
+            )
+            db.execute(
+                "INSERT INTO decks (deck_id, name, name_key, card_count, version) VALUES (?, ?, ?, 0, 1)",
+                (deck_id, str(name), catalogue_name(str(name))),
+            )
+            self._bump_version(db)
+            db.execute("COMMIT")
+        except:
+            db.execute("ROLLBACK")
+            raise
+        return deck_id
+
+    def rename_deck(self, deck_id, name):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            cur = db.execute(
+                "UPDATE decks SET name = ?, name_key = ?, version = version + 1 WHERE deck_id = ?",
+                (str(name), catalogue_name(str(name)), deck_id),
+            )
+            if cur.rowcount == 0:
+                db.execute("ROLLBACK")
+                return False
+            self._bump_version(db)
+            db.execute("COMMIT")
+        except:
+            db.execute("ROLLBACK")
+            raise
+        return True
+
+    def add_card(self, deck_id, front, back):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT card_count FROM decks WHERE deck_id = ?", (deck_id,)).fetchone()
+            if row is None:
+                db.execute("ROLLBACK")
+                return False
+            db.execute(
+                "INSERT INTO cards (deck_id, pos, front, back) VALUES (?, ?, ?, ?)",
+                (deck_id, row[0], str(front), str(back)),
+            )
+            db.execute(
+                "UPDATE decks SET card_count = card_count + 1, version = version + 1 WHERE deck_id = ?",
+                (deck_id,),
+            )
+            self._bump_version(db)
+            db.execute("COMMIT")
+        except:
+            db.execute("ROLLBACK")
+            raise
+        return True
+
+    def add_cards(self, deck_id, cards):
+        """
+        Appends many (front, back) cards in one transaction.
+        Returns False if the deck doesn't exist.
+        """
+        cards = [(str(front), str(back)) for front, back in cards]
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT card_count FROM decks WHERE deck_id = ?", (deck_id,)).fetchone()
+            if row is None:
+                db.execute("ROLLBACK")
+                return False
+            if not cards:
+                db.execute("ROLLBACK")
+                return True
+            start = row[0]
+            db.executemany(
+                "INSERT INTO cards (deck_id, pos, front, back) VALUES (?, ?, ?, ?)",
+                ((deck_id, start + i, front, back) for i, (front, back) in enumerate(cards)),
+            )
+            db.execute(
+                "UPDATE decks SET card_count = card_count + ?, version = version + 1 WHERE deck_id = ?",
+                (len(cards), deck_id),
+            )
+            self._bump_version(db)
+            db.execute("COMMIT")
+        except:
+            db.execute("ROLLBACK")
+            raise
+        return True
+
+    def _insert_deck(self, deck_id, name, cards):
+        # cards: list of {"front", "back"} dicts
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM cards WHERE deck_id = ?", (deck_id,))
+            db.execute(
+                "INSERT OR REPLACE INTO decks (deck_id, name, name_key, card_count, version)"
+                " VALUES (?, ?, ?, ?, 1)",
+                (deck_id, name, catalogue_name(name), len(cards)),
+            )
+            db.executemany(
+                "INSERT INTO cards (deck_id, pos, front, back) VALUES (?, ?, ?, ?)",
+                ((deck_id, i, str(c["front"]), str(c["back"])) for i, c in enumerate(cards)),
+            )
+            self._bump_version(db)
+            db.execute("COMMIT")
+        except:
+            db.execute("ROLLBACK")
+            raise
+        with self._lock:
+            entry = self._cards.pop(deck_id, None)
+            if entry is not None:
+                self._cards_bytes -= entry[1]
+            self._snapshots.pop(deck_id, None)
+
+    # --------- Import ---------
+
+    def import_json(self, json_path):
+        """
+        Copies every deck of a decks.json (journal included) into this
+        database. Decks with the same id are replaced. The source is only
+        read (see read_decks()).
+        """
+        decks, default_id = read_decks(json_path)
+        for deck_id, name, cards in decks:
+            self._insert_deck(deck_id, name, cards)
+        self.set_default_flash_deck(default_id)
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("usage: python -m hub_app.hub.sqlite_deck_store decks.json decks.db")
+        sys.exit(2)
+    store = SqliteDeckStore(sys.argv[2])
+    store.import_json(sys.argv[1])
+    print(f"Imported {len(store.list_flash_decks())} decks into {sys.argv[2]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# hub/store_common.py
+# Pieces every deck store shares: the menu order, the menu payload, and
+# (for the file-backed DeckStore / ShardedDeckStore) the cross-process
+# file lock and the catalogue listings.
+
+import os
+from bisect import bisect_right
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def catalogue_name(name):
+    # The case-insensitive sort key of a deck name (every backend uses this)
+    return name.lower()
+
+
+def catalogue_key(deck_id, name):
+    # Menu order: sample first, then by name (case-insensitive), then id
+    return (0 if deck_id == "sample" else 1, catalogue_name(name), deck_id)
+
+
+def menu_payload(decks, default_id):
+    # decks: (deck_id, name, count) in menu order -> what the menus show
+    return {
+        "default_flash_deck_id": default_id,
+        "flash_decks": [
+            {"id": deck_id, "name": name, "count": count, "is_default": deck_id == default_id}
+            for deck_id, name, count in decks
+        ],
+    }
+
+
+def stat_sig(path):
+    # Changes whenever the file is replaced or written (None: no file)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class FileLocking:
+    """
+    Mixin: _file_lock(), an flock() on self.lock_path shared with the other
+    processes using the same files. The store sets self._lock_file = None
+    and guards it with self._io_lock.
+    """
+
+    @contextmanager
+    def _file_lock(self, exclusive=True):
+        # Call with _io_lock held (flock is per open file, shared by threads).
+        # No fcntl (Windows): single process only.
+        if fcntl is None:
+            yield
+            return
+        if self._lock_file is None:
+            self._lock_file = open(self.lock_path, "a+b")
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _close_lock_file(self):
+        # Call with _io_lock held
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class CatalogueListing:
+    """
+    Mixin: the deck listings of a store that keeps a sorted self._catalogue
+    of catalogue_key()s under self._rw, a store self._version, and the
+    self._listing / self._menu caches. The store provides:
+      _deck_row(deck_id) -> (name, card count), with the read lock held
+      _default_id_locked(), with the read lock held
+      _before_read(), to pick up other processes' changes (may do nothing)
+    """
+
+    def list_flash_decks(self):
+        """
+        Returns a list of (deck_id, name, count): sample first, then by name.
+        Shared until the next change: don't modify it.
+        """
+        self._before_read()
+        with self._rw.read():
+            return self._listing_locked()
+
+    def list_flash_decks_page(self, after=None, limit=50):
+        """
+        One page of list_flash_decks(): up to `limit` decks sorting after
+        `after` = (deck_id, name) of the last deck of the previous page
+        (None: from the start). Found by key, not by offset, so pages stay
+        stable while decks are added or renamed. O(log n + limit).
+        """
+        self._before_read()
+        with self._rw.read():
+            i = 0 if after is None else bisect_right(self._catalogue, catalogue_key(*after))
+            return [(deck_id,) + self._deck_row(deck_id) for _, _, deck_id in self._catalogue[i:i + limit]]
+
+    def menu_decks(self):
+        """
+        {"default_flash_deck_id": ..., "flash_decks": [{"id", "name", "count",
+        "is_default"}, ...]}, built once per store version. Shared: don't modify it.
+        """
+        self._before_read()
+        with self._rw.read():
+            cached = self._menu
+            if cached is not None and cached[0] == self._version:
+                return cached[1]
+            payload = menu_payload(self._listing_locked(), self._default_id_locked())
+            self._menu = (self._version, payload)
+            return payload
+
+    def _listing_locked(self):
+        # Call with the read (or write) lock held.
+        # Two readers may both build it: same result, either one wins.
+        cached = self._listing
+        if cached is not None and cached[0] == self._version:
+            return cached[1]
+        result = [(deck_id,) + self._deck_row(deck_id) for _, _, deck_id in self._catalogue]
+        self._listing = (self._version, result)
+        return result
@@ -0,0 +1,86 @@
+# hub/streams.py
+# Fan-out of game updates to live /game/stream listeners (Server-Sent Events).
+#
+# - One set of small asyncio queues per game (one queue per listener).
+# - publish() never blocks and never buffers without limit: a listener whose
+#   queue is full is dropped, and its stream ends. It can reconnect with
+#   Last-Event-ID / ?since_version= to catch up.
+# - Only listeners connected to this process see its updates. With several
+#   workers sharing the sqlite session store, /game/stream also polls the
+#   store for changes made by the other workers (see engine.py).
+
+import asyncio
+
+
+class StreamHub:
+    def __init__(self, queue_size=16):
+        self.queue_size = queue_size
+        self._subs = {}      # game_id -> set of asyncio.Queue
+        self._loop = None
+
+    def subscribe(self, game_id):
+        """
+        Call from the event loop. Returns a queue that receives update dicts,
+        then None when the stream should end.
+        """
+        self._loop = asyncio.get_running_loop()
+        q = asyncio.Queue(maxsize=self.queue_size)
+        self._subs.setdefault(game_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, game_id, q):
+        subs = self._subs.get(game_id)
+        if subs is None:
+            return
+        subs.discard(q)
+        if not subs:
+            del self._subs[game_id]
+
+    def publish(self, game_id, update):
+        """
+        Sends update to every listener of game_id. Safe to call from any thread.
+        """
+        if game_id not in self._subs:
+            return  # nobody listening: nearly free
+        self._call_on_loop(self._publish, game_id, update)
+
+    def close(self, game_id):
+        """
+        Ends every stream of game_id (e.g. the game was ended).
+        """
+        if game_id not in self._subs:
+            return
+        self._call_on_loop(self._close, game_id)
+
+    # --------- Internals (run on the event loop) ---------
+
+    def _call_on_loop(self, fn, *args):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            fn(*args)
+        else:
+            loop.call_soon_threadsafe(fn, *args)
+
+    def _publish(self, game_id, update):
+        for q in list(self._subs.get(game_id, ())):
+            try:
+                q.put_nowait(update)
+            except asyncio.QueueFull:
+                # slow consumer: drop it instead of buffering more
+                self.unsubscribe(game_id, q)
+                self._end(q)
+
+    def _close(self, game_id):
+        for q in list(self._subs.pop(game_id, ())):
+            self._end(q)
+
+    def _end(self, q):
+        while not q.empty():
+            q.get_nowait()
+        q.put_nowait(None)
@@ -1,14 +1,14 @@
 # hub_app/main.py
 import pygame
 
-from .hub.deck_store import DeckStore
+from .hub.deck_store import open_deck_store
 from .hub.screens import WIDTH, HEIGHT, MainMenuScreen
 from cardgame_app.cardgame.engine import GameEngine
 
 
 class HubApp:
     def __init__(self):
-        self.store = DeckStore("decks.json")
+        self.store = open_deck_store("decks.json")
         self.running = True
         self.screen_obj = MainMenuScreen(self)
 
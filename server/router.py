@@ -0,0 +1,172 @@
+# router.py
+# Sticky front router: runs N engine.py processes ("shards") behind one port.
+#
+#   python router.py --shards 4 --port 8000
+#
+# or, with engines you started yourself (shard i needs GAME_ID_PREFIX="i."):
+#
+#   ENGINE_SHARDS=http://127.0.0.1:8001,http://127.0.0.1:8002 uvicorn router:app --port 8000
+#
+# - /game/start goes to the next shard (round robin). That shard puts its
+#   number in front of the game_id it creates ("2.<uuid>").
+# - Every other /game/* call is sent to the shard named in its game_id
+#   (taken from the path, e.g. /game/state/{game_id}, or the JSON body).
+# - Deck calls (/decks/..., /hub/menu) all go to shard 0, so a deck that was
+#   just created or changed is there on the next call. The other shards
+#   pick deck changes up from the shared store (a /game/start naming a
+#   deck they don't know yet makes them look right away).
+# - Anything else can go to any shard.
+#
+# The API is unchanged, so Rails' GameEngineService doesn't need to know.
+
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+
+SHARDS = [u.strip().rstrip("/") for u in os.environ.get("ENGINE_SHARDS", "").split(",") if u.strip()]
+
+# Headers that belong to one connection and must not be forwarded
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host",
+}
+
+_next_shard = itertools.count()
+CLIENT = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global CLIENT
+    # One pooled client: connections to the shards are kept alive and reused
+    CLIENT = httpx.AsyncClient(
+        timeout=httpx.Timeout(30.0, read=None),
+        limits=httpx.Limits(max_connections=None, max_keepalive_connections=256),
+    )
+    yield
+    await CLIENT.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def any_shard():
+    return SHARDS[next(_next_shard) % len(SHARDS)]
+
+
+def shard_for_game(game_id):
+    # "2.<uuid>" -> SHARDS[2]
+    head, sep, _ = str(game_id).partition(".")
+    if not sep or not head.isdigit() or int(head) >= len(SHARDS):
+        return None
+    return SHARDS[int(head)]
+
+
+def pick_shard(path, body):
+    if path == "decks" or path.startswith(("decks/", "hub/")):
+        return SHARDS[0]
+    if not path.startswith("game/") or path == "game/start":
+        return any_shard()
+
+    # /game/<action>/<game_id>
+    parts = path.split("/")
+    if len(parts) >= 3 and parts[2]:
+        return shard_for_game(parts[2])
+
+    # /game/<action> with {"game_id": ...} in the body
+    try:
+        game_id = json.loads(body).get("game_id")
+    except:
+        return None
+    return shard_for_game(game_id)
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def forward(path: str, request: Request):
+    if not SHARDS:
+        return JSONResponse({"detail": "No engine shards configured."}, status_code=503)
+
+    body = await request.body()
+    shard = pick_shard(path, body)
+    if shard is None:
+        return JSONResponse({"detail": "Unknown game_id"}, status_code=404)
+
+    headers = [(k, v) for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP]
+    upstream = CLIENT.build_request(
+        request.method,
+        shard + "/" + path,
+        params=request.query_params,
+        headers=headers,
+        content=body,
+    )
+    try:
+        resp = await CLIENT.send(upstream, stream=True)
+    except httpx.HTTPError:
+        return JSONResponse({"detail": "Engine shard unavailable."}, status_code=503)
+
+    # Stream the body back as-is (also works for long-lived streams)
+    out_headers = {k: v for k, v in resp.headers.items() if k.lower() not in HOP_BY_HOP}
+    return StreamingResponse(
+        resp.aiter_raw(),
+        status_code=resp.status_code,
+        headers=out_headers,
+        background=BackgroundTask(resp.aclose),  # connection goes back to the pool
+    )
+
+
+# -------------------------
+# Launcher: start N shards + the router
+# -------------------------
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run N engine shards behind one port.")
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--base-port", type=int, default=8100)
+    args = parser.parse_args()
+
+    procs = []
+    urls = []
+    for i in range(args.shards):
+        port = args.base_port + i
+        env = dict(os.environ)
+        env["GAME_ID_PREFIX"] = f"{i}."
+
+        # each shard keeps its own spill directory and action log
+        spill_dir = env.get("GAME_SPILL_DIR", "game_spill")
+        if spill_dir:
+            env["GAME_SPILL_DIR"] = os.path.join(spill_dir, f"shard{i}")
+        action_log = env.get("GAME_ACTION_LOG", "game_actions.log")
+        if action_log:
+            env["GAME_ACTION_LOG"] = f"{action_log}.shard{i}"
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "engine:app", "--host", "127.0.0.1", "--port", str(port)],
+            env=env,
+        ))
+        urls.append(f"http://127.0.0.1:{port}")
+
+    SHARDS[:] = urls
+    try:
+        uvicorn.run(app, host=args.host, port=args.port)
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+
+
+if __name__ == "__main__":
+    main()
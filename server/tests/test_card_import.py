@@ -0,0 +1,47 @@
+# tests/test_card_import.py
+# Run from server/:  python -m pytest tests
+
+from hub_app.hub.card_import import CardImportParser
+
+
+def parse(fmt, body, chunk_size=7, **kwargs):
+    parser = CardImportParser(fmt, **kwargs)
+    data = body.encode("utf-8")
+    for i in range(0, len(data), chunk_size):
+        parser.feed(data[i:i + chunk_size])
+    parser.close()
+    return parser
+
+
+def test_quoted_fields_may_span_lines():
+    p = parse("csv", 'front,back\n"a, b","multi\nline ""quoted"""\nc,d\n')
+    assert p.cards == [("a, b", 'multi\nline "quoted"'), ("c", "d")]
+    assert p.errors == []
+
+
+def test_stray_quote_mid_field_does_not_swallow_the_rest():
+    rows = "".join(f"q{i},a{i}\n" for i in range(20000))
+    p = parse("csv", '5" nails,size\n' + rows, chunk_size=4096)
+    assert p.cards[0] == ('5" nails', "size")
+    assert len(p.cards) == 20001
+    assert p.skipped == 0
+
+
+def test_unterminated_quote_is_capped():
+    rows = "".join(f"q{i},a{i}\n" for i in range(2000))
+    p = parse("csv", '"never closed,x\n' + rows, chunk_size=4096, max_record=1024)
+    assert p.errors[0]["line"] == 1
+    assert "longer than" in p.errors[0]["error"]
+    assert len(p.cards) > 1800   # only ~1KB after the quote is lost
+
+
+def test_overlong_line_is_skipped():
+    p = parse("tsv", "a\tb\n" + "x" * 5000 + "\nc\td\n", chunk_size=100, max_record=1024)
+    assert p.cards == [("a", "b"), ("c", "d")]
+    assert p.errors == [{"line": 2, "error": "line longer than 1024 characters"}]
+
+
+def test_ndjson_rows_and_errors():
+    p = parse("ndjson", '{"front": "a", "back": "b"}\nnot json\n\n{"front": "c"}\n')
+    assert p.cards == [("a", "b")]
+    assert [e["line"] for e in p.errors] == [2, 4]
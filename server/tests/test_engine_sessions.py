@@ -0,0 +1,99 @@
+# tests/test_engine_sessions.py
+# Run from server/:  python -m pytest tests
+
+import importlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    # engine.py keeps its decks, action log and spill files in the current
+    # directory, so give it an empty one
+    old_cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("engine"))
+    try:
+        yield importlib.import_module("engine")
+    finally:
+        os.chdir(old_cwd)
+
+
+@pytest.fixture(scope="module")
+def client(engine):
+    with TestClient(engine.app) as c:
+        yield c
+
+
+def play_a_little(client, engine, game_id):
+    for answer in ("wrong", None, None):
+        if answer is None:
+            answer = engine.GAMES.get(game_id)["current_a"]
+        assert client.post("/game/answer", json={"game_id": game_id, "answer": answer}).status_code == 200
+    client.post("/game/play", json={"game_id": game_id, "hand_index": 0})
+
+
+def replay(engine, game_id):
+    records = engine.ACTIONS.live_games()[game_id]
+    start = records[0]
+    s = engine.new_session(start["seed"], start["deck"], start["user"], start["n"])
+    for rec in records[1:]:
+        engine.apply_action(s, rec)
+    return start, s
+
+
+def same_game(engine, game_id, a, b):
+    assert engine.build_snapshot(game_id, a) == engine.build_snapshot(game_id, b)
+    assert a["deck_id"] == b["deck_id"]
+    assert a["cycler"].next() == b["cycler"].next()
+
+
+def test_replay_matches_the_live_game(client, engine):
+    game_id = client.post("/game/start", json={}).json()["game_id"]
+    play_a_little(client, engine, game_id)
+
+    _, replayed = replay(engine, game_id)
+    same_game(engine, game_id, engine.GAMES.get(game_id), replayed)
+
+
+def test_empty_deck_replays_from_the_deck_it_fell_back_to(client, engine):
+    deck_id = engine.STORE.create_deck("Nothing here yet")
+    game_id = client.post("/game/start", json={"deck_id": deck_id}).json()["game_id"]
+    play_a_little(client, engine, game_id)
+
+    # cards added later must not change the replayed game
+    engine.STORE.add_card(deck_id, "late", "card")
+
+    start, replayed = replay(engine, game_id)
+    assert start["deck"] == "sample"
+    same_game(engine, game_id, engine.GAMES.get(game_id), replayed)
+
+
+def test_unpacked_session_matches_the_live_game(client, engine):
+    game_id = client.post("/game/start", json={}).json()["game_id"]
+    play_a_little(client, engine, game_id)
+
+    live = engine.GAMES.get(game_id)
+    same_game(engine, game_id, live, engine.unpack_session(engine.pack_session(live)))
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    "bm90IGpzb24",                                   # "not json"
+    "WyJjYXJkIiwwXQ",                                # ["card",0]: wrong kind
+    "WyJkZWNrIiw1XQ",                                # ["deck",5]
+    "WyJkZWNrIixbImEiLDVdXQ",                        # ["deck",["a",5]]
+    "WyJkZWNrIixbImEiLCJiIiwiYyJdXQ",                # ["deck",["a","b","c"]]
+])
+def test_malformed_deck_cursor_is_rejected(client, cursor):
+    assert client.get("/decks", params={"cursor": cursor}).status_code == 400
+
+
+def test_deck_cursor_round_trip(client, engine):
+    for i in range(3):
+        engine.STORE.create_deck(f"Paged {i}")
+    first = client.get("/decks", params={"limit": 2}).json()
+    rest = client.get("/decks", params={"limit": 100, "cursor": first["next_cursor"]}).json()
+    ids = [d["id"] for d in first["flash_decks"] + rest["flash_decks"]]
+    assert ids == [d["id"] for d in client.get("/decks").json()["flash_decks"]]